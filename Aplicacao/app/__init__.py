@@ -1,6 +1,8 @@
 from flask import Flask
 from flask_socketio import SocketIO
 from dotenv import load_dotenv
+from app.compression import init_compression
+from app.encoders import FastJSONProvider
 import os
 
 # Carregar variáveis de ambiente
@@ -13,6 +15,12 @@ def create_app():
     """Cria a aplicação Flask e integra o Dash."""
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'chave_default')
+
+    # Serialização JSON rápida (orjson, se instalado) com datas em ISO 8601
+    app.json = FastJSONProvider(app)
+
+    # Compressão gzip/brotli das respostas, inclusive as transmitidas em streaming
+    init_compression(app)
     
     # Inicializar o Dash e vinculá-lo ao app Flask
 
@@ -1,13 +1,95 @@
-from flask import Blueprint, render_template, jsonify, request
-from app.services.data_service import DataService
+import hashlib
+from datetime import date, datetime
+
+from flask import Blueprint, Response, current_app, render_template, jsonify, request, stream_with_context
+from app.config import Config
+from app.encoders import resposta
+from app.metrics import exportar_metricas, init_metrics
+from app.services.data_service import FILTROS_DATA, FILTROS_VALOR, DataService
+from app.services.view_registry import ViewDesconhecida
 
 
 # Inicializar o blueprint
 api_bp = Blueprint("api", __name__)
 
+# Latência, bytes de resposta e consultas por endpoint, expostos em /metrics
+init_metrics(api_bp)
+
 # Instanciar o serviço de dados
 data_service = DataService()
 
+def etag_versao(*partes):
+    """
+    Gera uma ETag forte a partir da assinatura dos dados, sem precisar serializá-los a
+    cada requisição. As partes não dependem do processo: qualquer worker valida a ETag.
+    """
+    return hashlib.sha1(repr(partes).encode()).hexdigest()
+
+
+def nao_modificado(etag):
+    """Resposta 304 para um cliente que já possui a versão identificada por `etag`."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def parametros_paginacao():
+    """
+    Lê `limit` e `after_id` da query string. Retorna None quando a requisição não pede
+    paginação; levanta ValueError para valores inválidos.
+    """
+    if "limit" not in request.args and "after_id" not in request.args:
+        return None
+
+    limit = request.args.get("limit", Config.PAGINACAO_LIMITE_PADRAO, type=int)
+    after_id = request.args.get("after_id", type=int)
+    if "after_id" in request.args and after_id is None:
+        raise ValueError("Parâmetro 'after_id' deve ser um inteiro.")
+    if limit is None or not 1 <= limit <= Config.PAGINACAO_LIMITE_MAX:
+        raise ValueError(f"Parâmetro 'limit' deve estar entre 1 e {Config.PAGINACAO_LIMITE_MAX}.")
+    return limit, after_id
+
+
+def parametros_filtro():
+    """
+    Lê `fields`, `situacao`, `usuario` e os filtros de data da query string. Retorna
+    (campos, filtros) ou None quando nenhum deles foi enviado; levanta ValueError para
+    datas inválidas. `fields`, `situacao` e `usuario` aceitam vírgulas ou repetição.
+    """
+    def lista(nome):
+        valores = []
+        for valor in request.args.getlist(nome):
+            valores.extend(v.strip() for v in valor.split(",") if v.strip())
+        return valores
+
+    campos = lista("fields")
+    filtros = {chave: lista(chave) for chave, _ in FILTROS_VALOR if chave in request.args}
+    for chave, _, _ in FILTROS_DATA:
+        if chave not in request.args:
+            continue
+        valor = request.args[chave]
+        try:
+            # Datas sem hora continuam como date para que "_ate" inclua o dia inteiro
+            filtros[chave] = datetime.fromisoformat(valor) if "T" in valor or " " in valor else date.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f"Parâmetro '{chave}' deve ser uma data ISO 8601 (AAAA-MM-DD[THH:MM:SS]).")
+
+    if not campos and not filtros:
+        return None
+    return campos, filtros
+
+
+def resposta_condicional(payload):
+    """
+    Serializa o payload (no formato negociado) com uma ETag forte do conteúdo e devolve
+    304 quando ela coincide com o If-None-Match enviado pelo cliente.
+    """
+    response = resposta(payload)
+    response.add_etag()
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
 
 
 @api_bp.route("/", methods=["GET"])
@@ -22,7 +104,7 @@ def get_lotes():
         dados = data_service.obter_lotes()
 
         # Retornar a lista diretamente, sem índices numéricos
-        return jsonify({"success": True, "data": dados}), 200
+        return resposta_condicional({"success": True, "data": dados})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     
@@ -35,7 +117,7 @@ def get_subfases():
         dados = data_service.obter_subfases()
 
         # Retornar a lista diretamente, sem índices numéricos
-        return jsonify({"success": True, "data": dados}), 200
+        return resposta_condicional({"success": True, "data": dados})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     
@@ -45,7 +127,7 @@ def get_materialized_views():
     """Endpoint para listar todas as materialized views."""
     try:
         materialized_views = data_service.listar_materialized_views()
-        return jsonify({"success": True, "data": materialized_views}), 200
+        return resposta({"success": True, "data": materialized_views})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     
@@ -58,7 +140,7 @@ def get_lotes_subfases():
     """
     try:
         lotes_subfases = data_service.obter_lotes_subfases()
-        return jsonify({"success": True, "data": lotes_subfases}), 200
+        return resposta_condicional({"success": True, "data": lotes_subfases})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -69,13 +151,128 @@ def get_lotes_subfases():
 def get_view_data(view_name):
     """
     Endpoint para retornar os dados de uma materialized view específica.
+    A ETag acompanha a assinatura dos dados da view em cache, então a revalidação não
+    consulta o banco; sem ela (view fora do cache ou desatualizada), vem do corpo da resposta.
+    Com `limit` e/ou `after_id`, retorna apenas uma página (ordenada por id) e o `next_cursor`.
+    Com `fields`, `situacao`, `usuario`, `inicio_de`, `inicio_ate`, `fim_de` ou `fim_ate`,
+    seleciona apenas as colunas e linhas pedidas diretamente no SQL.
+    """
+    try:
+        paginacao = parametros_paginacao()
+        filtro = parametros_filtro()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        assinatura = data_service.assinatura_view(view_name)
+        # O formato negociado faz parte da representação identificada pela ETag
+        consulta = (tuple(sorted(request.args.items(multi=True))), request.headers.get("Accept"))
+        etag = etag_versao("view", view_name, assinatura, consulta) if assinatura else None
+        if etag and request.if_none_match.contains_weak(etag):
+            return nao_modificado(etag)
+
+        if filtro:
+            campos, filtros = filtro
+            limit, after_id = paginacao or (None, None)
+            dados, proximo = data_service.obter_dados_view_filtrados(
+                view_name, campos=campos, filtros=filtros, limit=limit, after_id=after_id
+            )
+            payload = {"success": True, "data": dados}
+            if paginacao:
+                payload["next_cursor"] = proximo
+            response = resposta(payload)
+        elif paginacao:
+            limit, after_id = paginacao
+            dados, proximo = data_service.obter_pagina_view(view_name, limit, after_id)
+            response = resposta({"success": True, "data": dados, "next_cursor": proximo})
+        else:
+            assinatura, dados = data_service.obter_dados_view_assinado(view_name)
+            response = resposta({"success": True, "data": dados})
+            etag = etag_versao("view", view_name, assinatura, consulta) if assinatura else None
+
+        if etag is None:
+            # Sem assinatura em cache, a ETag vem do conteúdo, como em resposta_condicional
+            response.add_etag()
+        else:
+            response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except ViewDesconhecida as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api_bp.route("/api/view/<string:view_name>/summary", methods=["GET"])
+def get_view_summary(view_name):
+    """
+    Endpoint para retornar as séries agregadas de uma materialized view, prontas para os gráficos.
+    """
+    try:
+        resumo = data_service.obter_resumo_view(view_name)
+        return resposta({"success": True, "data": resumo})
+    except ViewDesconhecida as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api_bp.route("/api/view/<string:view_name>/changes", methods=["GET"])
+def get_view_changes(view_name):
+    """
+    Endpoint para retornar apenas as alterações de uma materialized view desde o cursor `since`
+    (a `versao` de uma resposta anterior). Sem `since`, com uma versão antiga demais ou com um
+    cursor de outro worker ou de antes de um reinício, retorna a view inteira para ressincronização.
+    """
+    desde = request.args.get("since")
+
+    try:
+        alteracoes = data_service.obter_alteracoes_view(view_name, desde)
+        return resposta({"success": True, "data": alteracoes})
+    except ViewDesconhecida as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api_bp.route("/api/view/<string:view_name>/stream", methods=["GET"])
+def get_view_data_stream(view_name):
+    """
+    Endpoint para transmitir os dados de uma materialized view em NDJSON (uma linha JSON por registro),
+    mantendo o uso de memória constante independentemente do tamanho da view.
     """
+    batch_size = request.args.get("batch_size", type=int)
+    if "batch_size" in request.args and (
+        batch_size is None or not 1 <= batch_size <= Config.DB_STREAM_BATCH_SIZE_MAX
+    ):
+        return jsonify({
+            "success": False,
+            "error": f"Parâmetro 'batch_size' deve estar entre 1 e {Config.DB_STREAM_BATCH_SIZE_MAX}."
+        }), 400
+
     try:
-        dados = data_service.obter_dados_view_especifica(view_name)
-        return jsonify({"success": True, "data": dados}), 200
+        linhas = data_service.iterar_dados_view_especifica(view_name, batch_size=batch_size)
+
+        # Antecipar a primeira linha para que erros de consulta ainda virem um 500
+        primeira = next(linhas, None)
+    except ViewDesconhecida as e:
+        return jsonify({"success": False, "error": str(e)}), 404
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+    def gerar():
+        if primeira is None:
+            return
+        yield current_app.json.dumps(primeira) + "\n"
+        for linha in linhas:
+            yield current_app.json.dumps(linha) + "\n"
+
+    return Response(stream_with_context(gerar()), mimetype="application/x-ndjson")
+
 
 @api_bp.route("/api/dados_views", methods=["GET"])
 def get_dados_todas_views():
@@ -83,8 +280,114 @@ def get_dados_todas_views():
     Endpoint para buscar os dados de todas as materialized views no schema 'acompanhamento'.
     """
     try:
-        dados_agrupados = data_service.obter_dados_todas_views()
+        paralelismo = request.args.get("paralelismo", type=int)
+        dados_agrupados = data_service.obter_dados_todas_views(paralelismo=paralelismo)
+
+        return resposta({"success": True, "data": dados_agrupados})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api_bp.route("/api/views/batch", methods=["GET", "POST"])
+def get_views_batch():
+    """
+    Endpoint para buscar várias materialized views em uma única resposta, consultadas em paralelo.
+    Aceita `views` (lista separada por vírgulas, ou lista no corpo JSON) ou `lote_id`
+    para trazer todas as subfases do lote.
+    """
+    corpo = request.get_json(silent=True) if request.method == "POST" else None
+    if not isinstance(corpo, dict):
+        corpo = {}
+    views = corpo.get("views") or [
+        v.strip() for valor in request.args.getlist("views") for v in valor.split(",") if v.strip()
+    ]
+    # Inteiros vêm do corpo JSON ou da query string; valores presentes e inválidos são rejeitados
+    inteiros = {}
+    for campo in ("lote_id", "paralelismo"):
+        if campo in corpo:
+            valor = corpo[campo]
+            valido = valor is None or (isinstance(valor, int) and not isinstance(valor, bool))
+        else:
+            valor = request.args.get(campo, type=int)
+            valido = campo not in request.args or valor is not None
+        if not valido:
+            return jsonify({"success": False, "error": f"'{campo}' deve ser um inteiro."}), 400
+        inteiros[campo] = valor
+    lote_id, paralelismo = inteiros["lote_id"], inteiros["paralelismo"]
+
+    if not views and lote_id is None:
+        return jsonify({"success": False, "error": "Informe 'views' ou 'lote_id'."}), 400
+    if not isinstance(views, list) or not all(isinstance(v, str) for v in views):
+        return jsonify({"success": False, "error": "'views' deve ser uma lista de nomes."}), 400
+
+    try:
+        if lote_id is not None and not views:
+            views = data_service.views_do_lote(lote_id)
+            if views is None:
+                return jsonify({"success": False, "error": f"Lote {lote_id} não encontrado."}), 404
+
+        # Remover repetições mantendo a ordem pedida
+        views = list(dict.fromkeys(views))
+        if len(views) > Config.BATCH_MAX_VIEWS:
+            return jsonify({
+                "success": False,
+                "error": f"No máximo {Config.BATCH_MAX_VIEWS} views por requisição."
+            }), 400
+
+        dados = data_service.obter_dados_views(views, paralelismo=paralelismo)
+        return resposta({"success": True, "data": dados})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api_bp.route("/api/pool_stats", methods=["GET"])
+def get_pool_stats():
+    """
+    Endpoint para consultar o estado do pool de conexões com o banco de dados.
+    """
+    try:
+        return jsonify({"success": True, "data": data_service.db.pool_stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 
-        return jsonify({"success": True, "data": dados_agrupados}), 200
+@api_bp.route("/api/cache_stats", methods=["GET"])
+def get_cache_stats():
+    """
+    Endpoint para consultar os contadores dos caches de lotes e subfases.
+    """
+    try:
+        return jsonify({"success": True, "data": data_service.estatisticas_cache()}), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api_bp.route("/api/admin/consultas_lentas", methods=["GET", "DELETE"])
+def get_consultas_lentas():
+    """
+    Endpoint administrativo com o log de consultas lentas e os planos EXPLAIN (ANALYZE, BUFFERS)
+    amostrados, do mais recente para o mais antigo. DELETE descarta os planos guardados.
+    """
+    registro = data_service.db.consultas_lentas
+    if request.method == "DELETE":
+        registro.limpar()
+    return jsonify({"success": True, "data": {**registro.stats(), "planos": registro.planos()}}), 200
+
+
+@api_bp.route("/api/admin/refresh_views", methods=["GET"])
+def get_refresh_views():
+    """
+    Endpoint administrativo com as views aguardando refresh e a duração dos refreshes por view.
+    """
+    try:
+        return jsonify({"success": True, "data": data_service.agendador_refresh.stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Endpoint com as métricas de latência, consultas e pool no formato texto do Prometheus.
+    """
+    return exportar_metricas()
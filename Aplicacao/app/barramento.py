@@ -0,0 +1,69 @@
+import json
+import threading
+
+from app.config import Config, fila_distribuida
+
+
+class Barramento:
+    def __init__(self):
+        """
+        Distribui as notificações recebidas pelo Notifier para os ouvintes locais
+        (ex.: invalidação de caches). Esta versão entrega tudo no próprio processo.
+        """
+        self.ouvintes = []
+
+    def assinar(self, ouvinte):
+        """Registra uma função chamada com (canal, payload) a cada notificação."""
+        self.ouvintes.append(ouvinte)
+
+    def publicar(self, canal, payload):
+        """Publica uma notificação para todos os ouvintes."""
+        self._entregar(canal, payload)
+
+    def _entregar(self, canal, payload):
+        for ouvinte in self.ouvintes:
+            try:
+                ouvinte(canal, payload)
+            except Exception as e:
+                print(f"Erro ao processar notificação em {ouvinte}: {e}")
+
+    def iniciar(self):
+        """Nada a fazer: a entrega local é síncrona."""
+
+
+class BarramentoRedis(Barramento):
+    def __init__(self, url, canal="dashboard:notificacoes"):
+        """
+        Barramento entre workers via pub/sub do Redis: o Notifier eleito publica e cada
+        worker entrega a notificação aos seus ouvintes locais.
+        """
+        import redis
+
+        super().__init__()
+        self.canal = canal
+        self.redis = redis.Redis.from_url(url)
+
+    def publicar(self, canal, payload):
+        self.redis.publish(self.canal, json.dumps({"canal": canal, "payload": payload}))
+
+    def _escutar(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.canal)
+        for mensagem in pubsub.listen():
+            try:
+                dados = json.loads(mensagem["data"])
+            except (TypeError, ValueError) as e:
+                print(f"Mensagem inválida no barramento: {e}")
+                continue
+            self._entregar(dados["canal"], dados["payload"])
+
+    def iniciar(self):
+        """Inicia a thread que recebe as notificações publicadas pelo Notifier eleito."""
+        threading.Thread(target=self._escutar, name="barramento", daemon=True).start()
+
+
+def criar_barramento():
+    """Usa o Redis da fila de mensagens do Socket.IO, se configurado; senão, entrega local."""
+    if fila_distribuida():
+        return BarramentoRedis(Config.SOCKETIO_MESSAGE_QUEUE)
+    return Barramento()
@@ -0,0 +1,135 @@
+import zlib
+
+from flask import request
+from app.config import Config
+
+# Brotli é opcional: sem o pacote, apenas gzip é negociado
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Tipos de conteúdo que valem a pena comprimir
+TIPOS_COMPRIMIVEIS = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/msgpack",
+    "application/vnd.apache.arrow.stream",
+)
+
+
+class _Gzip:
+    def __init__(self, nivel):
+        self._compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # wbits=31: cabeçalho gzip
+
+    def processar(self, dados):
+        return self._compressor.compress(dados)
+
+    def descarregar(self):
+        # Z_SYNC_FLUSH entrega o que já foi comprimido sem encerrar o stream
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, nivel):
+        self._compressor = brotli.Compressor(quality=nivel)
+
+    def processar(self, dados):
+        return self._compressor.process(dados)
+
+    def descarregar(self):
+        return self._compressor.flush()
+
+    def finalizar(self):
+        return self._compressor.finish()
+
+
+def _escolher_codificacao():
+    """Codificação preferida pelo cliente entre as disponíveis (br antes de gzip no empate)."""
+    aceitas = request.accept_encodings
+    candidatas = []
+    if brotli is not None and aceitas.quality("br") > 0:
+        candidatas.append(("br", aceitas.quality("br")))
+    if aceitas.quality("gzip") > 0:
+        candidatas.append(("gzip", aceitas.quality("gzip")))
+    if not candidatas:
+        return None
+    return max(candidatas, key=lambda candidata: candidata[1])[0]
+
+
+def _novo_compressor(codificacao):
+    if codificacao == "br":
+        return _Brotli(Config.COMPRESSAO_NIVEL_BROTLI)
+    return _Gzip(Config.COMPRESSAO_NIVEL_GZIP)
+
+
+def _comprimir_stream(iteravel, compressor):
+    """
+    Comprime um corpo em streaming. O primeiro bloco é descarregado na hora, para não
+    atrasar o primeiro byte; os demais se acumulam no compressor até somarem
+    COMPRESSAO_DESCARGA_BYTES, já que cada descarga encerra um bloco e piora a compressão.
+    """
+    primeiro = True
+    pendentes = 0  # Bytes recebidos desde a última descarga
+    try:
+        for bloco in iteravel:
+            if isinstance(bloco, str):
+                bloco = bloco.encode()
+            saida = compressor.processar(bloco)
+            pendentes += len(bloco)
+            if primeiro or pendentes >= Config.COMPRESSAO_DESCARGA_BYTES:
+                saida += compressor.descarregar()
+                primeiro = False
+                pendentes = 0
+            if saida:
+                yield saida
+        yield compressor.finalizar()
+    finally:
+        if hasattr(iteravel, "close"):
+            iteravel.close()
+
+
+def comprimir_resposta(response):
+    """Hook after_request: aplica gzip/brotli negociado às respostas comprimíveis."""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or not response.mimetype.startswith(TIPOS_COMPRIMIVEIS)
+    ):
+        return response
+
+    codificacao = _escolher_codificacao()
+    response.vary.add("Accept-Encoding")
+    if codificacao is None:
+        return response
+
+    compressor = _novo_compressor(codificacao)
+    if response.is_streamed:
+        response.response = _comprimir_stream(response.response, compressor)
+        response.headers.pop("Content-Length", None)
+    else:
+        corpo = response.get_data()
+        if len(corpo) < Config.COMPRESSAO_TAMANHO_MIN:
+            return response
+        response.set_data(compressor.processar(corpo) + compressor.finalizar())
+
+    response.headers["Content-Encoding"] = codificacao
+
+    # A representação comprimida não é byte a byte igual: a ETag passa a ser fraca
+    etag, fraca = response.get_etag()
+    if etag and not fraca:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Registra a compressão de respostas no app Flask."""
+    if Config.COMPRESSAO_ATIVA:
+        app.after_request(comprimir_resposta)
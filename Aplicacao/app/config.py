@@ -7,7 +7,7 @@ load_dotenv()
 class Config:
     """Carrega as configurações da aplicação, incluindo as do banco de dados."""
     SECRET_KEY = os.getenv("SECRET_KEY", "chave_default")
-    
+
     # Configurações do Banco de Dados
     DB_CONFIG = {
         "dbname": os.getenv("DB_NAME"),
@@ -16,3 +16,111 @@ class Config:
         "host": os.getenv("DB_HOST"),
         "port": os.getenv("DB_PORT", "5432"),
     }
+
+    # Configurações do pool de conexões
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # Espera máxima por uma conexão (s)
+    DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))  # Ociosidade antes do descarte (s)
+    DB_POOL_PING_APOS = float(os.getenv("DB_POOL_PING_APOS", "30"))  # Ociosidade que exige "SELECT 1" (s)
+
+    # Tamanho dos lotes lidos pelos cursores do lado do servidor (streaming)
+    DB_STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", "2000"))
+    DB_STREAM_BATCH_SIZE_MAX = int(os.getenv("DB_STREAM_BATCH_SIZE_MAX", "20000"))  # Máximo pedido em ?batch_size
+
+    # Tempo de vida (s) do cache das tabelas de dimensão (lote, subfase)
+    LOOKUP_CACHE_TTL = float(os.getenv("LOOKUP_CACHE_TTL", "300"))
+
+    # Máximo de views consultadas simultaneamente em /api/dados_views
+    DB_VIEWS_PARALELISMO = int(os.getenv("DB_VIEWS_PARALELISMO", "4"))
+
+    # Cache de resultados das materialized views
+    RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+    RESULT_CACHE_SWR = os.getenv("RESULT_CACHE_SWR", "false").lower() == "true"  # stale-while-revalidate
+    RESULT_CACHE_MAX_IDADE = float(os.getenv("RESULT_CACHE_MAX_IDADE", "3600"))  # s; 0 desativa
+
+    # Memória (MB) dos dados de subfase compartilhados pelos gráficos do Dash
+    DASH_DADOS_CACHE_MB = int(os.getenv("DASH_DADOS_CACHE_MB", "64"))
+
+    # Tempo de vida (s) do registro de materialized views lido de pg_matviews
+    VIEW_REGISTRY_TTL = float(os.getenv("VIEW_REGISTRY_TTL", "300"))
+
+    # Paginação por chave (limit/after_id)
+    PAGINACAO_LIMITE_PADRAO = int(os.getenv("PAGINACAO_LIMITE_PADRAO", "1000"))
+    PAGINACAO_LIMITE_MAX = int(os.getenv("PAGINACAO_LIMITE_MAX", "10000"))
+
+    # Compressão das respostas (gzip/brotli negociado por Accept-Encoding)
+    COMPRESSAO_ATIVA = os.getenv("COMPRESSAO_ATIVA", "true").lower() == "true"
+    COMPRESSAO_TAMANHO_MIN = int(os.getenv("COMPRESSAO_TAMANHO_MIN", "1024"))  # bytes
+    COMPRESSAO_NIVEL_GZIP = int(os.getenv("COMPRESSAO_NIVEL_GZIP", "6"))  # 1 a 9
+    COMPRESSAO_NIVEL_BROTLI = int(os.getenv("COMPRESSAO_NIVEL_BROTLI", "5"))  # 0 a 11
+    COMPRESSAO_DESCARGA_BYTES = int(os.getenv("COMPRESSAO_DESCARGA_BYTES", "32768"))  # Entre descargas do streaming
+
+    # Máximo de views aceitas por requisição em /api/views/batch
+    BATCH_MAX_VIEWS = int(os.getenv("BATCH_MAX_VIEWS", "50"))
+
+    # Log de alterações das views (/api/view/<nome>/changes)
+    CHANGE_FEED_MAX_VERSOES = int(os.getenv("CHANGE_FEED_MAX_VERSOES", "50"))
+    CHANGE_FEED_MAX_LINHAS = int(os.getenv("CHANGE_FEED_MAX_LINHAS", "5000"))
+
+    # Modo de produção (python run.py --producao): gunicorn com vários workers assíncronos
+    WEB_BIND = os.getenv("WEB_BIND", "0.0.0.0:5000")
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", "4"))
+    WEB_WORKER_CLASS = os.getenv("WEB_WORKER_CLASS", "eventlet")  # eventlet ou gevent
+
+    # Fila de mensagens compartilhada pelos workers (ex.: redis://localhost:6379/0)
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+
+    # Eleição do Notifier: só o processo que obtém o advisory lock escuta o PostgreSQL
+    NOTIFIER_LOCK_ID = int(os.getenv("NOTIFIER_LOCK_ID", "7310016"))
+    NOTIFIER_ELEICAO_INTERVALO = float(os.getenv("NOTIFIER_ELEICAO_INTERVALO", "10"))  # s
+
+    # Log de consultas lentas e captura amostrada de EXPLAIN (ANALYZE, BUFFERS)
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+    SLOW_QUERY_EXPLAIN_AMOSTRA = float(os.getenv("SLOW_QUERY_EXPLAIN_AMOSTRA", "0.1"))  # 0 a 1
+    SLOW_QUERY_MAX_PLANOS = int(os.getenv("SLOW_QUERY_MAX_PLANOS", "50"))
+
+    # Refresh das materialized views disparado pelas notificações (opt-in)
+    MATVIEW_REFRESH_ATIVO = os.getenv("MATVIEW_REFRESH_ATIVO", "false").lower() == "true"
+    MATVIEW_REFRESH_DEBOUNCE = float(os.getenv("MATVIEW_REFRESH_DEBOUNCE", "2"))  # Silêncio antes do refresh (s)
+    MATVIEW_REFRESH_MAX_ESPERA = float(os.getenv("MATVIEW_REFRESH_MAX_ESPERA", "30"))  # Adiamento máximo (s)
+    MATVIEW_REFRESH_WORKERS = int(os.getenv("MATVIEW_REFRESH_WORKERS", "2"))
+
+    # Notifier: canais do LISTEN (separados por vírgula), heartbeat e backoff de reconexão (s)
+    NOTIFIER_CANAIS = [c.strip() for c in os.getenv("NOTIFIER_CANAIS", "atualizacao_tabela").split(",") if c.strip()]
+    NOTIFIER_HEARTBEAT = float(os.getenv("NOTIFIER_HEARTBEAT", "30"))
+    NOTIFIER_BACKOFF_MIN = float(os.getenv("NOTIFIER_BACKOFF_MIN", "1"))
+    NOTIFIER_BACKOFF_MAX = float(os.getenv("NOTIFIER_BACKOFF_MAX", "60"))
+
+    # Janela (s) em que notificações da mesma view viram um único evento do Socket.IO
+    REALTIME_JANELA_COALESCENCIA = float(os.getenv("REALTIME_JANELA_COALESCENCIA", "0.5"))
+
+    # Fila de saída de cada cliente do Socket.IO: tamanho máximo, política quando chega uma
+    # mensagem nova ("ultimo" substitui a pendente de mesmo tipo; "descartar_antigo" só
+    # descarta ao encher) e tempo (s) sem confirmar uma entrega até o cliente ser desconectado
+    REALTIME_FILA_MAX = int(os.getenv("REALTIME_FILA_MAX", "20"))
+    REALTIME_FILA_POLITICA = os.getenv("REALTIME_FILA_POLITICA", "ultimo")
+    REALTIME_ATRASO_MAX = float(os.getenv("REALTIME_ATRASO_MAX", "30"))
+
+
+# Filas de mensagens que o barramento usa para entregar as notificações a todos os workers
+ESQUEMAS_REDIS = ("redis://", "rediss://", "unix://")
+
+
+def fila_distribuida():
+    """Indica se a fila de mensagens configurada permite entregar as notificações a todos os workers."""
+    url = Config.SOCKETIO_MESSAGE_QUEUE
+    return bool(url) and url.startswith(ESQUEMAS_REDIS)
+
+
+def exigir_fila_distribuida(workers):
+    """
+    Impede o modo de produção com vários workers sem um barramento Redis: só o worker
+    eleito receberia as notificações, e os caches dos demais nunca seriam invalidados.
+    """
+    if workers > 1 and not fila_distribuida():
+        raise RuntimeError(
+            f"WEB_WORKERS={workers} exige SOCKETIO_MESSAGE_QUEUE com uma URL do Redis "
+            f"({', '.join(ESQUEMAS_REDIS)}) para distribuir as notificações entre os workers; "
+            "configure a fila ou use WEB_WORKERS=1."
+        )
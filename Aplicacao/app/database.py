@@ -1,19 +1,352 @@
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import errors, sql
 from psycopg2.extras import RealDictCursor
 from app.config import Config
+from app.consultas_lentas import RegistroConsultasLentas
+from app.metrics import MedicaoConsulta, registrar_espera_conexao
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão ficou disponível dentro do tempo limite do pool."""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs):
+        """Conexão do pool; guarda os prepared statements já criados nesta sessão."""
+        super().__init__(*args, **kwargs)
+        self.preparados = set()
+
+
+class ConnectionPool:
+    def __init__(self, config, minconn=1, maxconn=10, timeout=30.0,
+                 idle_timeout=300.0, ping_apos=30.0):
+        """
+        Pool de conexões limitado e thread-safe.
+
+        Mantém no mínimo `minconn` e no máximo `maxconn` conexões abertas, descarta
+        conexões ociosas há mais de `idle_timeout` segundos e valida com "SELECT 1"
+        as conexões que ficaram paradas por mais de `ping_apos` segundos antes de
+        entregá-las.
+        """
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Limites inválidos para o pool de conexões.")
+
+        self.config = config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_apos = ping_apos
+
+        self._cond = threading.Condition()
+        self._ociosas = deque()  # (conexão, instante em que foi devolvida)
+        self._total = 0
+        self._em_uso = 0
+        self._aguardando = 0
+
+        # Estatísticas de checkout
+        self._checkouts = 0
+        self._checkout_total = 0.0
+        self._checkout_max = 0.0
+        self._timeouts = 0
+        self._descartadas = 0
+
+    def _abrir(self):
+        return psycopg2.connect(connection_factory=PooledConnection, **self.config)
+
+    def _fechar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _viva(self, conn, ociosa_desde):
+        """Verifica se a conexão ainda está utilizável antes de entregá-la."""
+        if conn.closed:
+            return False
+        if time.monotonic() - ociosa_desde < self.ping_apos:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _despejar_ociosas(self):
+        """Fecha conexões ociosas além do tempo limite, respeitando o mínimo. Requer o lock."""
+        agora = time.monotonic()
+        expiradas = []
+        while self._ociosas and self._total > self.minconn:
+            conn, desde = self._ociosas[0]
+            if agora - desde < self.idle_timeout:
+                break
+            self._ociosas.popleft()
+            self._total -= 1
+            expiradas.append(conn)
+        return expiradas
+
+    def acquire(self):
+        """Retira uma conexão do pool, aguardando até `timeout` segundos se estiver cheio."""
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        while True:
+            with self._cond:
+                for conn in self._despejar_ociosas():
+                    self._fechar(conn)
+
+                candidata = None
+                abrir_nova = False
+                while candidata is None and not abrir_nova:
+                    if self._ociosas:
+                        # LIFO: reutiliza a conexão mais recente e deixa as antigas expirarem
+                        candidata = self._ociosas.pop()
+                    elif self._total < self.maxconn:
+                        self._total += 1
+                        abrir_nova = True
+                    else:
+                        restante = limite - time.monotonic()
+                        if restante <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f"Nenhuma conexão disponível após {self.timeout}s "
+                                f"(máximo de {self.maxconn})."
+                            )
+                        self._aguardando += 1
+                        try:
+                            self._cond.wait(restante)
+                        finally:
+                            self._aguardando -= 1
+
+            # Abertura e verificação de saúde acontecem fora do lock
+            if abrir_nova:
+                try:
+                    conn = self._abrir()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                conn, desde = candidata
+                if not self._viva(conn, desde):
+                    self._fechar(conn)
+                    with self._cond:
+                        self._total -= 1
+                        self._descartadas += 1
+                        self._cond.notify()
+                    continue
+
+            with self._cond:
+                self._em_uso += 1
+                espera = time.monotonic() - inicio
+                self._checkouts += 1
+                self._checkout_total += espera
+                self._checkout_max = max(self._checkout_max, espera)
+            registrar_espera_conexao(espera)
+            return conn
+
+    def release(self, conn, descartar=False):
+        """Devolve uma conexão ao pool, descartando-a se estiver quebrada."""
+        if not descartar and not conn.closed:
+            try:
+                # Garante que nenhuma transação pendente volte para o pool
+                if conn.status != psycopg2.extensions.STATUS_READY:
+                    conn.rollback()
+            except Exception:
+                descartar = True
+
+        with self._cond:
+            self._em_uso -= 1
+            if descartar or conn.closed:
+                self._total -= 1
+                self._descartadas += 1
+            else:
+                self._ociosas.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            self._fechar(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager que retira uma conexão e a devolve ao final."""
+        conn = self.acquire()
+        descartar = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            descartar = True
+            raise
+        finally:
+            self.release(conn, descartar=descartar)
+
+    def stats(self):
+        """Retorna um retrato do estado atual do pool."""
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "total": self._total,
+                "em_uso": self._em_uso,
+                "ociosas": len(self._ociosas),
+                "aguardando": self._aguardando,
+                "checkouts": self._checkouts,
+                "checkout_medio_ms": (
+                    self._checkout_total / self._checkouts * 1000 if self._checkouts else 0.0
+                ),
+                "checkout_max_ms": self._checkout_max * 1000,
+                "timeouts": self._timeouts,
+                "descartadas": self._descartadas,
+            }
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas do pool."""
+        with self._cond:
+            ociosas = [conn for conn, _ in self._ociosas]
+            self._ociosas.clear()
+            self._total -= len(ociosas)
+        for conn in ociosas:
+            self._fechar(conn)
+
 
 class Database:
+    _pool = None
+    _pool_lock = threading.Lock()
+    _cursor_seq = itertools.count(1)  # Nomes únicos para os cursores do lado do servidor
+
+    # Log de consultas lentas com planos amostrados, compartilhado por todas as instâncias
+    consultas_lentas = RegistroConsultasLentas(
+        limite_ms=Config.SLOW_QUERY_MS,
+        amostragem=Config.SLOW_QUERY_EXPLAIN_AMOSTRA,
+        max_planos=Config.SLOW_QUERY_MAX_PLANOS,
+        conectar=lambda: psycopg2.connect(**Config.DB_CONFIG),
+    )
+
     def __init__(self):
         """Configuração centralizada do banco de dados."""
         self.config = Config.DB_CONFIG
 
+    @property
+    def pool(self):
+        """Pool compartilhado por todas as instâncias, criado sob demanda."""
+        if Database._pool is None:
+            with Database._pool_lock:
+                if Database._pool is None:
+                    Database._pool = ConnectionPool(
+                        self.config,
+                        minconn=Config.DB_POOL_MIN,
+                        maxconn=Config.DB_POOL_MAX,
+                        timeout=Config.DB_POOL_TIMEOUT,
+                        idle_timeout=Config.DB_POOL_IDLE_TIMEOUT,
+                        ping_apos=Config.DB_POOL_PING_APOS,
+                    )
+        return Database._pool
+
     def connect(self):
-        """Cria e retorna uma conexão com o banco de dados."""
+        """Cria e retorna uma conexão avulsa com o banco de dados (fora do pool)."""
         return psycopg2.connect(**self.config)
 
     def fetch_all(self, query, params=None):
         """Executa uma query e retorna todos os resultados."""
-        with self.connect() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params or ())
-                return cursor.fetchall()
+        with self.pool.connection() as conn:
+            with conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor, MedicaoConsulta() as medicao:
+                    inicio = time.perf_counter()
+                    cursor.execute(query, params or ())
+                    linhas = cursor.fetchall()
+                    medicao.linhas = len(linhas)
+                    self.consultas_lentas.registrar(
+                        cursor, query, params, time.perf_counter() - inicio, len(linhas)
+                    )
+                    return linhas
+
+    def execute(self, query, params=None):
+        """Executa um comando sem resultado (ex.: REFRESH) e confirma a transação."""
+        with self.pool.connection() as conn:
+            with conn:
+                with conn.cursor() as cursor, MedicaoConsulta():
+                    cursor.execute(query, params or ())
+
+    def fetch_prepared(self, nome, query, params=None):
+        """
+        Executa `query` como o prepared statement `nome`, preparando-o apenas na primeira
+        vez em cada conexão do pool. Parâmetros usam a sintaxe $1, $2... na query.
+
+        Se o EXECUTE falha porque o statement não existe mais na sessão (ex.: DISCARD ALL)
+        ou porque a view mudou de colunas, o nome é descartado e preparado de novo, uma vez.
+        """
+        with self.pool.connection() as conn:
+            with conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor, MedicaoConsulta() as medicao:
+                    if nome not in conn.preparados:
+                        self._preparar(conn, cursor, nome, query)
+
+                    execute = sql.SQL("EXECUTE {}").format(sql.Identifier(nome))
+                    if params:
+                        execute += sql.SQL(" ({})").format(sql.SQL(", ").join(sql.Placeholder() * len(params)))
+                    inicio = time.perf_counter()
+                    try:
+                        cursor.execute(execute, params or ())
+                    except (errors.InvalidSqlStatementName, errors.FeatureNotSupported) as e:
+                        conn.rollback()
+                        conn.preparados.discard(nome)
+                        if isinstance(e, errors.FeatureNotSupported):
+                            # "cached plan must not change result type": o statement ainda existe
+                            cursor.execute(sql.SQL("DEALLOCATE {}").format(sql.Identifier(nome)))
+                        self._preparar(conn, cursor, nome, query)
+                        inicio = time.perf_counter()
+                        cursor.execute(execute, params or ())
+                    linhas = cursor.fetchall()
+                    medicao.linhas = len(linhas)
+                    # O log mostra a consulta preparada; o EXPLAIN a prepara de novo em outra conexão
+                    self.consultas_lentas.registrar(
+                        cursor, execute, params, time.perf_counter() - inicio, len(linhas),
+                        texto=query, preparada=query,
+                    )
+                    return linhas
+
+    @staticmethod
+    def _preparar(conn, cursor, nome, query):
+        """Cria o prepared statement `nome` na sessão da conexão e o registra nela."""
+        cursor.execute(sql.SQL("PREPARE {} AS {}").format(sql.Identifier(nome), query))
+        conn.preparados.add(nome)
+
+    def iter_rows(self, query, params=None, batch_size=None):
+        """
+        Executa uma query com um cursor nomeado (do lado do servidor) e devolve as
+        linhas aos poucos, lendo `batch_size` linhas por vez com fetchmany.
+
+        A conexão fica presa ao gerador até que ele seja consumido ou fechado.
+        """
+        batch_size = batch_size or Config.DB_STREAM_BATCH_SIZE
+        nome_cursor = f"stream_{next(Database._cursor_seq)}"
+        with self.pool.connection() as conn:
+            with conn:
+                with conn.cursor(name=nome_cursor, cursor_factory=RealDictCursor) as cursor, MedicaoConsulta() as medicao:
+                    cursor.itersize = batch_size
+                    # Só o tempo gasto no banco conta para o log de lentas, não o do consumidor
+                    inicio = time.perf_counter()
+                    cursor.execute(query, params or ())
+                    tempo_banco = time.perf_counter() - inicio
+                    while True:
+                        inicio = time.perf_counter()
+                        linhas = cursor.fetchmany(batch_size)
+                        tempo_banco += time.perf_counter() - inicio
+                        if not linhas:
+                            break
+                        medicao.linhas += len(linhas)
+                        yield from linhas
+                    self.consultas_lentas.registrar(cursor, query, params, tempo_banco, medicao.linhas)
+
+    def pool_stats(self):
+        """Retorna as estatísticas do pool de conexões."""
+        return self.pool.stats()
@@ -0,0 +1,139 @@
+import json
+from collections import OrderedDict
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+# Dependências opcionais: sem elas, o formato correspondente não é oferecido
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+MIME_JSON = "application/json"
+MIME_MSGPACK = "application/msgpack"
+MIME_ARROW = "application/vnd.apache.arrow.stream"
+
+
+def _padrao_json(obj):
+    """Conversão dos tipos que vêm do banco e não são nativos de JSON."""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provedor JSON da aplicação: usa orjson quando instalado e, em ambos os caminhos,
+    serializa datas em ISO 8601 (em vez do formato HTTP padrão do Flask).
+    """
+    default = staticmethod(_padrao_json)
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        opcoes = orjson.OPT_NON_STR_KEYS
+        if kwargs.get("indent"):
+            opcoes |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_padrao_json, option=opcoes).decode()
+
+
+def _codificar_json(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_padrao_json, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_padrao_json, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _padrao_msgpack(obj):
+    # Datas viram o tipo Timestamp nativo do MessagePack (horários sem fuso são tratados como UTC)
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em MessagePack")
+
+
+def _codificar_msgpack(payload):
+    return msgpack.packb(payload, default=_padrao_msgpack, use_bin_type=True)
+
+
+def _codificar_arrow(payload):
+    """
+    Codifica `payload["data"]` como um stream Arrow IPC colunar; os demais campos do
+    payload vão nos metadados do schema. Retorna None se os dados não forem tabulares.
+    """
+    dados = payload.get("data") if isinstance(payload, dict) else None
+    if not isinstance(dados, list) or not all(isinstance(linha, dict) for linha in dados):
+        return None
+    try:
+        tabela = pa.Table.from_pylist(dados)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        return None
+
+    metadados = {k: _codificar_json(v) for k, v in payload.items() if k != "data"}
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tabela.schema) as writer:
+        writer.write_table(tabela)
+    return sink.getvalue().to_pybytes()
+
+
+# Codificadores disponíveis, em ordem de preferência do servidor
+ENCODERS = OrderedDict([(MIME_JSON, _codificar_json)])
+if msgpack is not None:
+    ENCODERS[MIME_MSGPACK] = _codificar_msgpack
+if pa is not None:
+    ENCODERS[MIME_ARROW] = _codificar_arrow
+
+
+def registrar_encoder(mimetype, codificar):
+    """Registra um novo formato de resposta; `codificar(payload)` retorna bytes ou None."""
+    ENCODERS[mimetype] = codificar
+
+
+def formatos_aceitos():
+    """Formatos suportados pelo servidor na ordem de preferência do cabeçalho Accept."""
+    accept = request.accept_mimetypes
+    if not accept:
+        return [MIME_JSON]
+    aceitos = [mimetype for mimetype in ENCODERS if accept.quality(mimetype) > 0]
+    # sorted é estável: em caso de empate vale a ordem do servidor (JSON primeiro)
+    return sorted(aceitos, key=accept.quality, reverse=True) or [MIME_JSON]
+
+
+def resposta(payload, status=200):
+    """
+    Monta a resposta no melhor formato aceito pelo cliente (JSON, MessagePack ou Arrow IPC),
+    caindo para o próximo formato quando um codificador não se aplica ao payload.
+    """
+    for mimetype in formatos_aceitos():
+        corpo = ENCODERS[mimetype](payload)
+        if corpo is not None:
+            break
+    else:
+        mimetype, corpo = MIME_JSON, _codificar_json(payload)
+
+    response = Response(corpo, status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
@@ -0,0 +1,229 @@
+import contextvars
+import functools
+import inspect
+import os
+import time
+
+from flask import Response, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# Faixas (s) pensadas para consultas e respostas do dashboard: de 5 ms a 1 min
+FAIXAS_TEMPO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Faixas de tamanho: de 1 KB a 256 MB
+FAIXAS_BYTES = tuple(1024 * 4 ** n for n in range(10))
+# Faixas de quantidade de linhas: de 1 a 1 milhão
+FAIXAS_LINHAS = (1, 10, 100, 1000, 10_000, 100_000, 1_000_000)
+# Faixas de profundidade das filas de saída do Socket.IO
+FAIXAS_FILA = (0, 1, 2, 5, 10, 20, 50, 100)
+
+LATENCIA_REQUISICAO = Histogram(
+    "dashboard_http_request_duration_seconds",
+    "Latência das requisições da API por endpoint.",
+    ["endpoint", "metodo", "status"],
+    buckets=FAIXAS_TEMPO,
+)
+BYTES_RESPOSTA = Histogram(
+    "dashboard_http_response_bytes",
+    "Tamanho das respostas serializadas (antes da compressão) por endpoint.",
+    ["endpoint"],
+    buckets=FAIXAS_BYTES,
+)
+TEMPO_CONSULTA = Histogram(
+    "dashboard_db_query_duration_seconds",
+    "Tempo de execução das consultas por método do DataService.",
+    ["metodo"],
+    buckets=FAIXAS_TEMPO,
+)
+LINHAS_CONSULTA = Histogram(
+    "dashboard_db_rows_fetched",
+    "Linhas lidas por consulta, por método do DataService.",
+    ["metodo"],
+    buckets=FAIXAS_LINHAS,
+)
+ESPERA_CONEXAO = Histogram(
+    "dashboard_db_pool_acquire_seconds",
+    "Tempo de espera para obter uma conexão do pool.",
+    buckets=FAIXAS_TEMPO,
+)
+DURACAO_REFRESH = Histogram(
+    "dashboard_matview_refresh_seconds",
+    "Duração dos refreshes de materialized views, por view.",
+    ["view"],
+    buckets=FAIXAS_TEMPO,
+)
+NOTIFICACOES_RECEBIDAS = Counter(
+    "dashboard_realtime_notificacoes_recebidas",
+    "Notificações recebidas pelo difusor de eventos do Socket.IO.",
+)
+EVENTOS_EMITIDOS = Counter(
+    "dashboard_realtime_eventos_emitidos",
+    "Eventos emitidos pelo Socket.IO após a coalescência, por escopo (sala ou todos).",
+    ["escopo"],
+)
+DURACAO_FIGURAS = Histogram(
+    "dashboard_realtime_figuras_seconds",
+    "Tempo para recalcular as figuras de uma subfase enviadas pelo Socket.IO.",
+    buckets=FAIXAS_TEMPO,
+)
+PROFUNDIDADE_FILA = Histogram(
+    "dashboard_realtime_fila_profundidade",
+    "Mensagens na fila de saída de um cliente do Socket.IO, medidas a cada enfileiramento.",
+    buckets=FAIXAS_FILA,
+)
+MENSAGENS_PENDENTES = Gauge(
+    "dashboard_realtime_mensagens_pendentes",
+    "Mensagens aguardando envio nas filas de saída dos clientes do Socket.IO.",
+    multiprocess_mode="livesum",
+)
+MENSAGENS_DESCARTADAS = Counter(
+    "dashboard_realtime_mensagens_descartadas",
+    "Mensagens removidas das filas de saída sem envio, por motivo (substituida ou fila_cheia).",
+    ["motivo"],
+)
+CLIENTES_DESCONECTADOS = Counter(
+    "dashboard_realtime_clientes_desconectados",
+    "Clientes do Socket.IO desconectados por não confirmarem as entregas a tempo.",
+)
+ERROS_CONSULTA = Counter(
+    "dashboard_db_query_errors",
+    "Consultas que terminaram em erro, por método do DataService.",
+    ["metodo"],
+)
+
+# Método do DataService em execução; atribui as consultas do Database a ele
+_metodo_atual = contextvars.ContextVar("metodo_atual", default="outro")
+
+# Endpoints que não entram nas métricas de requisição
+_IGNORADOS = {"api.get_metrics"}
+
+
+def medir_metodo(func):
+    """
+    Decorador para métodos do DataService: as consultas feitas durante a chamada são
+    contabilizadas com o nome do método. Funciona também com geradores.
+    """
+    nome = func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gerador(*args, **kwargs):
+            iterador = func(*args, **kwargs)
+            try:
+                while True:
+                    # O nome vale apenas durante cada passo, que pode rodar em outro contexto
+                    token = _metodo_atual.set(nome)
+                    try:
+                        item = next(iterador)
+                    except StopIteration:
+                        return
+                    finally:
+                        _metodo_atual.reset(token)
+                    yield item
+            finally:
+                iterador.close()
+        return gerador
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _metodo_atual.set(nome)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _metodo_atual.reset(token)
+    return wrapper
+
+
+class MedicaoConsulta:
+    """
+    Context manager usado pelo Database em volta de cada consulta: mede o tempo e
+    registra as linhas informadas em `linhas`, atribuindo-as ao método atual.
+    """
+
+    def __init__(self):
+        self.metodo = _metodo_atual.get()
+        self.linhas = 0
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *_):
+        TEMPO_CONSULTA.labels(self.metodo).observe(time.perf_counter() - self._inicio)
+        if tipo is None or tipo is GeneratorExit:
+            LINHAS_CONSULTA.labels(self.metodo).observe(self.linhas)
+        else:
+            ERROS_CONSULTA.labels(self.metodo).inc()
+        return False
+
+
+def registrar_espera_conexao(segundos):
+    """Registra o tempo de checkout de uma conexão do pool."""
+    ESPERA_CONEXAO.observe(segundos)
+
+
+def _contar_stream(iteravel, endpoint, inicio, metodo, status):
+    """Mede o tamanho e a duração de respostas em streaming quando terminam de ser enviadas."""
+    total = 0
+    try:
+        for bloco in iteravel:
+            total += len(bloco.encode() if isinstance(bloco, str) else bloco)
+            yield bloco
+    finally:
+        if hasattr(iteravel, "close"):
+            iteravel.close()
+        BYTES_RESPOSTA.labels(endpoint).observe(total)
+        LATENCIA_REQUISICAO.labels(endpoint, metodo, status).observe(time.perf_counter() - inicio)
+
+
+def _iniciar_medicao():
+    request.environ["metrics.inicio"] = time.perf_counter()
+
+
+def _registrar_medicao(response):
+    inicio = request.environ.get("metrics.inicio")
+    endpoint = request.endpoint or "desconhecido"
+    if inicio is None or endpoint in _IGNORADOS:
+        return response
+
+    status = str(response.status_code)
+    if response.is_streamed:
+        # Latência e tamanho só são conhecidos ao final do envio
+        response.response = _contar_stream(response.response, endpoint, inicio, request.method, status)
+        return response
+
+    if not response.direct_passthrough:
+        BYTES_RESPOSTA.labels(endpoint).observe(response.calculate_content_length() or 0)
+    LATENCIA_REQUISICAO.labels(endpoint, request.method, status).observe(time.perf_counter() - inicio)
+    return response
+
+
+def init_metrics(blueprint):
+    """
+    Instrumenta as rotas do blueprint. Os hooks do blueprint rodam antes dos do app,
+    então o tamanho medido é o da resposta serializada, antes da compressão.
+    """
+    blueprint.before_request(_iniciar_medicao)
+    blueprint.after_request(_registrar_medicao)
+
+
+def exportar_metricas():
+    """
+    Resposta no formato texto do Prometheus. Com PROMETHEUS_MULTIPROC_DIR definido
+    (modo de produção com vários workers), agrega as métricas de todos os processos.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return Response(generate_latest(registro), content_type=CONTENT_TYPE_LATEST)
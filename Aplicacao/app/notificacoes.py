@@ -0,0 +1,135 @@
+import json
+
+from app.services.view_registry import PADRAO_VIEW
+
+# Operações aceitas no campo "operacao" do payload
+OPERACOES = {"INSERT", "UPDATE", "DELETE", "TRUNCATE"}
+
+
+def _inteiro(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class Notificacao:
+    def __init__(self, canal, payload, tabela=None, operacao=None, lote_id=None, subfase_id=None, ids=None):
+        """
+        Notificação do PostgreSQL já interpretada. O payload é um JSON com os campos
+        (todos opcionais):
+
+            {"tabela": "macrocontrole.atividade", "operacao": "UPDATE",
+             "lote_id": 3, "subfase_id": 12, "ids": [101, 102]}
+
+        enviado, por exemplo, por um trigger com pg_notify(canal, json_build_object(...)::text).
+        O nome de uma view (lote_<id>_subfase_<id>) também é aceito. Sem lote nem
+        subfase, a notificação é geral: vale para todas as views.
+        """
+        self.canal = canal
+        self.payload = payload
+        self.tabela = tabela
+        self.operacao = operacao
+        self.lote_id = lote_id
+        self.subfase_id = subfase_id
+        self.ids = ids or []
+
+    @property
+    def geral(self):
+        return self.lote_id is None and self.subfase_id is None
+
+    def afeta_tabela(self, tabelas):
+        """Indica se a notificação pode vir de uma das `tabelas` (nomes sem schema)."""
+        return self.tabela is None or self.tabela.rsplit(".", 1)[-1] in tabelas
+
+    def views(self, todas):
+        """Views de `todas` afetadas: as do lote e/ou da subfase informados, ou todas se geral."""
+        afetadas = set()
+        for view_name in todas:
+            correspondencia = PADRAO_VIEW.fullmatch(view_name)
+            if not correspondencia:
+                continue
+            lote_id, subfase_id = (int(grupo) for grupo in correspondencia.groups())
+            if self.lote_id not in (None, lote_id) or self.subfase_id not in (None, subfase_id):
+                continue
+            afetadas.add(view_name)
+        return afetadas
+
+    def como_dict(self):
+        return {
+            "canal": self.canal,
+            "tabela": self.tabela,
+            "operacao": self.operacao,
+            "lote_id": self.lote_id,
+            "subfase_id": self.subfase_id,
+            "ids": self.ids,
+        }
+
+    def __repr__(self):
+        return f"Notificacao({self.como_dict()!r})"
+
+
+def interpretar(canal, payload):
+    """
+    Converte o payload bruto de um NOTIFY em uma `Notificacao`. Payloads vazios ou fora
+    do protocolo viram uma notificação geral.
+    """
+    if isinstance(payload, str):
+        correspondencia = PADRAO_VIEW.fullmatch(payload)
+        if correspondencia:
+            lote_id, subfase_id = (int(grupo) for grupo in correspondencia.groups())
+            return Notificacao(canal, payload, lote_id=lote_id, subfase_id=subfase_id)
+
+    try:
+        dados = json.loads(payload)
+    except (TypeError, ValueError):
+        return Notificacao(canal, payload)
+    if not isinstance(dados, dict):
+        return Notificacao(canal, payload)
+
+    tabela = dados.get("tabela")
+    operacao = str(dados.get("operacao") or "").upper()
+    ids = dados.get("ids")
+    return Notificacao(
+        canal,
+        payload,
+        tabela=tabela if isinstance(tabela, str) and tabela else None,
+        operacao=operacao if operacao in OPERACOES else None,
+        lote_id=_inteiro(dados.get("lote_id")),
+        subfase_id=_inteiro(dados.get("subfase_id")),
+        ids=list(ids) if isinstance(ids, list) else [],
+    )
+
+
+class Despachante:
+    def __init__(self):
+        """
+        Interpreta cada notificação uma única vez e a entrega, como `Notificacao`, aos
+        ouvintes interessados (caches, agendador de refresh, salas do Socket.IO).
+        """
+        self.ouvintes = []
+
+    def assinar(self, ouvinte, tabelas=None, canais=None):
+        """
+        Registra `ouvinte(notificacao)`. Com `tabelas`, o ouvinte só recebe notificações
+        dessas tabelas ou de origem desconhecida; com `canais`, só as desses canais.
+        """
+        self.ouvintes.append((
+            ouvinte,
+            set(tabelas) if tabelas else None,
+            set(canais) if canais else None,
+        ))
+
+    def despachar(self, canal, payload):
+        """Ouvinte com (canal, payload) bruto, compatível com o Notifier e o barramento."""
+        notificacao = interpretar(canal, payload)
+        for ouvinte, tabelas, canais in self.ouvintes:
+            if tabelas is not None and not notificacao.afeta_tabela(tabelas):
+                continue
+            if canais is not None and canal not in canais:
+                continue
+            try:
+                ouvinte(notificacao)
+            except Exception as e:
+                print(f"Erro ao processar notificação em {ouvinte}: {e}")
+        return notificacao
@@ -1,22 +1,129 @@
+import random
+import select
+import time
+
 import psycopg2
+from psycopg2 import sql
 from app.config import Config
+from app.notificacoes import Despachante
 
 class Notifier:
-    def __init__(self, socketio):
-        """Configuração centralizada do banco de dados."""
-        self.socketio = socketio
+    def __init__(self, ouvintes=None, eleicao=False, canais=None):
+        """
+        Configuração centralizada do banco de dados.
+
+        `ouvintes` são funções chamadas com (canal, payload) bruto a cada notificação
+        recebida, por exemplo para repassá-la ao barramento. Quem precisa do conteúdo
+        assina o `despachante`, que entrega a notificação já interpretada.
+
+        Com `eleicao`, vários processos podem iniciar o Notifier, mas só o que obtiver
+        o advisory lock `Config.NOTIFIER_LOCK_ID` escuta o canal; os demais ficam de
+        reserva e assumem se a conexão do eleito cair.
+
+        `canais` são os canais do LISTEN (padrão: Config.NOTIFIER_CANAIS).
+        """
+        self.despachante = Despachante()
         self.config = Config.DB_CONFIG
+        self.ouvintes = list(ouvintes or [])
+        self.eleicao = eleicao
+        self.canais = list(canais or Config.NOTIFIER_CANAIS)
+
+    @staticmethod
+    def _aguardar_eleicao(cursor):
+        """
+        Bloqueia até este processo obter o advisory lock do Notifier. Retorna True se
+        precisou esperar, isto é, se assumiu o lugar de outro processo.
+        """
+        esperou = False
+        while True:
+            cursor.execute("SELECT pg_try_advisory_lock(%s);", (Config.NOTIFIER_LOCK_ID,))
+            if cursor.fetchone()[0]:
+                return esperou
+            esperou = True
+            time.sleep(Config.NOTIFIER_ELEICAO_INTERVALO)
 
-    def listen_notifications(self, channel="atualizacao_tabela"):
-        """Escuta notificações no canal do PostgreSQL."""
-        with psycopg2.connect(**self.config) as conn:
+    def _conectar(self):
+        """
+        Abre a conexão LISTEN com keepalive de TCP e se inscreve em todos os canais.
+        Retorna (conexão, assumiu), com `assumiu` verdadeiro se outro Notifier escutava antes.
+        """
+        conn = psycopg2.connect(
+            keepalives=1,
+            keepalives_idle=int(Config.NOTIFIER_HEARTBEAT),
+            keepalives_interval=10,
+            keepalives_count=3,
+            **self.config,
+        )
+        assumiu = False
+        try:
             conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
-            cursor = conn.cursor()
-            cursor.execute(f"LISTEN {channel};")
-            print(f"Aguardando notificações no canal '{channel}'...")
-
-            while True:
-                conn.poll()
-                while conn.notifies:
-                    notificacao = conn.notifies.pop(0)
-                    self.socketio.emit("atualizacao", {"data": notificacao.payload})
+            with conn.cursor() as cursor:
+                if self.eleicao:
+                    # O lock é de sessão: é liberado pelo PostgreSQL se este processo morrer
+                    assumiu = self._aguardar_eleicao(cursor)
+                for canal in self.canais:
+                    cursor.execute(sql.SQL("LISTEN {};").format(sql.Identifier(canal)))
+        except Exception:
+            conn.close()
+            raise
+        return conn, assumiu
+
+    def _despachar(self, canal, payload):
+        for ouvinte in self.ouvintes:
+            try:
+                ouvinte(canal, payload)
+            except Exception as e:
+                print(f"Erro ao processar notificação em {ouvinte}: {e}")
+        self.despachante.despachar(canal, payload)
+
+    def _escutar(self, conn):
+        """
+        Espera no socket da conexão até chegar uma notificação. Sem notificações por
+        `Config.NOTIFIER_HEARTBEAT` segundos, envia um "SELECT 1" para detectar uma
+        conexão que caiu sem aviso.
+        """
+        while True:
+            prontos, _, _ = select.select([conn], [], [], Config.NOTIFIER_HEARTBEAT)
+            if not prontos:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1;")
+                continue
+
+            conn.poll()
+            while conn.notifies:
+                notificacao = conn.notifies.pop(0)
+                self._despachar(notificacao.channel, notificacao.payload)
+
+    def listen_notifications(self):
+        """
+        Escuta notificações nos canais do PostgreSQL, reconectando com backoff
+        exponencial quando a conexão cai (ex.: reinício do banco).
+        """
+        espera = Config.NOTIFIER_BACKOFF_MIN
+        reconexao = False
+        while True:
+            try:
+                conn, assumiu = self._conectar()
+            except psycopg2.Error as e:
+                # Jitter evita que todos os workers reconectem no mesmo instante
+                atraso = espera * random.uniform(0.5, 1.0)
+                print(f"Notifier sem conexão ({e}); nova tentativa em {atraso:.1f}s.")
+                time.sleep(atraso)
+                espera = min(espera * 2, Config.NOTIFIER_BACKOFF_MAX)
+                continue
+
+            espera = Config.NOTIFIER_BACKOFF_MIN
+            print(f"Aguardando notificações nos canais {', '.join(self.canais)}...")
+            if reconexao or assumiu:
+                # Notificações enviadas enquanto ninguém escutava se perderam:
+                # tratar como alteração geral em cada canal
+                for canal in self.canais:
+                    self._despachar(canal, None)
+
+            try:
+                self._escutar(conn)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError, OSError) as e:
+                print(f"Conexão do Notifier perdida ({e}); reconectando...")
+            finally:
+                conn.close()
+            reconexao = True
@@ -0,0 +1,355 @@
+import threading
+import time
+from collections import deque
+
+from flask import request
+
+from app.config import Config
+from app.metrics import (
+    CLIENTES_DESCONECTADOS,
+    DURACAO_FIGURAS,
+    EVENTOS_EMITIDOS,
+    MENSAGENS_DESCARTADAS,
+    MENSAGENS_PENDENTES,
+    NOTIFICACOES_RECEBIDAS,
+    PROFUNDIDADE_FILA,
+)
+from app.services.data_service import DataService
+from app.services.view_registry import PADRAO_VIEW
+
+
+def sala_lote(lote_id):
+    """Sala dos clientes que selecionaram um lote, mas ainda nenhuma subfase."""
+    return f"lote_{lote_id}"
+
+
+def salas_da_notificacao(notificacao):
+    """
+    Salas interessadas em uma notificação: as das views afetadas (lote_<id>_subfase_<id>)
+    e as dos lotes delas. Retorna None quando a notificação é geral, e vale para todos.
+    """
+    if notificacao.geral:
+        return None
+
+    salas = notificacao.views(DataService.registro_views.views())
+    if notificacao.lote_id is not None and notificacao.subfase_id is not None:
+        # A view pode ainda não estar no catálogo em cache deste processo
+        salas.add(f"lote_{notificacao.lote_id}_subfase_{notificacao.subfase_id}")
+    if notificacao.lote_id is not None:
+        salas.add(sala_lote(notificacao.lote_id))
+    for view_name in list(salas):
+        correspondencia = PADRAO_VIEW.fullmatch(view_name)
+        if correspondencia:
+            salas.add(sala_lote(correspondencia.group(1)))
+    return salas
+
+
+class FilaCliente:
+    def __init__(self):
+        """Fila de saída de um cliente do Socket.IO."""
+        self.mensagens = deque()  # (evento, chave, dados)
+        self.sala = None  # Sala inscrita pelo evento "inscrever"
+        self.confirmar = False  # O cliente pediu entregas com confirmação (ack)
+        self.aguardando_desde = None  # Instante do envio ainda não confirmado pelo cliente
+        self.descartou = False  # Houve descarte por fila cheia desde o último "atualizacao"
+
+
+class Entregador:
+    def __init__(self, socketio, tamanho=None, politica=None, atraso_max=None):
+        """
+        Filas de saída limitadas para os clientes do Socket.IO conectados a este processo.
+
+        Os clientes que se inscrevem com `confirmar` têm no máximo uma mensagem em
+        trânsito: a próxima só é enviada quando o navegador confirma (ack) a anterior, e
+        as demais esperam em uma fila de até `tamanho` mensagens. Com a política "ultimo",
+        uma mensagem nova substitui a pendente de mesma chave; ao encher, a fila descarta
+        as mais antigas. O cliente que passa `atraso_max` segundos sem confirmar uma
+        entrega é desconectado. Os demais recebem cada mensagem assim que ela chega.
+
+        A sala de cada cliente fica aqui, sob o mesmo lock das filas: o dicionário de
+        salas do manager do Socket.IO é alterado sem um lock que possamos usar.
+        """
+        self.socketio = socketio
+        self.tamanho = Config.REALTIME_FILA_MAX if tamanho is None else tamanho
+        self.politica = politica or Config.REALTIME_FILA_POLITICA
+        self.atraso_max = Config.REALTIME_ATRASO_MAX if atraso_max is None else atraso_max
+        self._lock = threading.Lock()
+        self._filas = {}  # sid -> FilaCliente
+        self._salas = {}  # sala -> sids
+        self._vigiando = False
+
+    def conectar(self, sid):
+        with self._lock:
+            self._filas[sid] = FilaCliente()
+            iniciar, self._vigiando = not self._vigiando, True
+        if iniciar:
+            self.socketio.start_background_task(self._vigiar)
+
+    def desconectar(self, sid):
+        with self._lock:
+            fila = self._filas.pop(sid, None)
+            if fila is not None:
+                self._sair(sid, fila)
+        if fila is not None and fila.mensagens:
+            MENSAGENS_PENDENTES.dec(len(fila.mensagens))
+
+    def inscrever(self, sid, sala, confirmar=False):
+        """Troca a sala do cliente (nenhuma, se None) e define se ele confirma as entregas."""
+        with self._lock:
+            fila = self._filas.get(sid)
+            if fila is None:
+                return
+            self._sair(sid, fila)
+            fila.confirmar = confirmar
+            if not confirmar:
+                fila.aguardando_desde = None
+            if sala is not None:
+                fila.sala = sala
+                self._salas.setdefault(sala, set()).add(sid)
+        self._bombear(sid)
+
+    def _sair(self, sid, fila):
+        """Requer o lock."""
+        if fila.sala is None:
+            return
+        sids = self._salas.get(fila.sala)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._salas[fila.sala]
+        fila.sala = None
+
+    def salas_com_clientes(self):
+        """Salas com clientes conectados a este processo."""
+        with self._lock:
+            return list(self._salas)
+
+    def _destinatarios(self, salas):
+        """Clientes deste processo nas `salas` (todos, se None). Requer o lock."""
+        if salas is None:
+            return list(self._filas)
+        sids = set()
+        for sala in salas:
+            sids.update(self._salas.get(sala, ()))
+        return list(sids)
+
+    def enviar(self, evento, dados, salas=None, chave=None):
+        """
+        Enfileira o evento para os clientes das `salas` (todos, se None). `chave` identifica
+        as mensagens que se substituem na política "ultimo" (padrão: o nome do evento).
+        """
+        with self._lock:
+            sids = self._destinatarios(salas)
+            for sid in sids:
+                self._enfileirar(self._filas[sid], evento, chave or evento, dados)
+        for sid in sids:
+            self._bombear(sid)
+
+    def _enfileirar(self, fila, evento, chave, dados):
+        """Requer o lock."""
+        if self.politica == "ultimo":
+            for indice, (_, outra, _) in enumerate(fila.mensagens):
+                if outra == chave:
+                    del fila.mensagens[indice]
+                    MENSAGENS_DESCARTADAS.labels("substituida").inc()
+                    MENSAGENS_PENDENTES.dec()
+                    break
+
+        fila.mensagens.append((evento, chave, dados))
+        MENSAGENS_PENDENTES.inc()
+        while len(fila.mensagens) > self.tamanho:
+            fila.mensagens.popleft()
+            fila.descartou = True
+            MENSAGENS_DESCARTADAS.labels("fila_cheia").inc()
+            MENSAGENS_PENDENTES.dec()
+        PROFUNDIDADE_FILA.observe(len(fila.mensagens))
+
+    def _bombear(self, sid):
+        """
+        Envia as mensagens do cliente: todas, se ele não confirma as entregas; senão a
+        próxima, se nenhuma estiver aguardando confirmação.
+        """
+        with self._lock:
+            fila = self._filas.get(sid)
+            if fila is None or fila.aguardando_desde is not None or not fila.mensagens:
+                return
+            confirmar = fila.confirmar
+            envios = []
+            while fila.mensagens and not (confirmar and envios):
+                evento, _, dados = fila.mensagens.popleft()
+                MENSAGENS_PENDENTES.dec()
+                if evento == "atualizacao" and fila.descartou:
+                    # Figuras podem ter sido descartadas: o cliente recarrega pelos callbacks
+                    dados = {**dados, "figuras": []}
+                    fila.descartou = False
+                envios.append((evento, dados))
+            if confirmar:
+                fila.aguardando_desde = time.monotonic()
+
+        # Direto pelo servidor do python-socketio: só clientes deste processo
+        for evento, dados in envios:
+            self.socketio.server.emit(
+                evento, dados, to=sid, namespace="/",
+                callback=(lambda *_: self._confirmar(sid)) if confirmar else None,
+                ignore_queue=True,
+            )
+
+    def _confirmar(self, sid):
+        with self._lock:
+            fila = self._filas.get(sid)
+            if fila is not None:
+                fila.aguardando_desde = None
+        self._bombear(sid)
+
+    def _vigiar(self):
+        """Desconecta os clientes com uma entrega sem confirmação há mais de `atraso_max` segundos."""
+        while True:
+            self.socketio.sleep(max(self.atraso_max / 4, 1))
+            limite = time.monotonic() - self.atraso_max
+            with self._lock:
+                atrasados = [
+                    sid for sid, fila in self._filas.items()
+                    if fila.aguardando_desde is not None and fila.aguardando_desde < limite
+                ]
+            for sid in atrasados:
+                print(f"Cliente {sid} sem confirmar entregas há {self.atraso_max:.0f}s; desconectando.")
+                CLIENTES_DESCONECTADOS.inc()
+                self.desconectar(sid)
+                try:
+                    self.socketio.server.disconnect(sid, namespace="/", ignore_queue=True)
+                except Exception as e:
+                    print(f"Erro ao desconectar o cliente {sid}: {e}")
+
+
+class Difusor:
+    def __init__(self, socketio, entregador, janela=None, calcular_figuras=None):
+        """
+        Emite os eventos "atualizacao" do Socket.IO a partir das notificações, pelas
+        filas de saída do `entregador`, para os clientes conectados a este processo.
+
+        Notificações que chegam dentro de `janela` segundos são agrupadas: cada conjunto
+        de salas recebe um único evento com o último payload e o número de notificações
+        agrupadas. Notificações sem lote viram um evento para todos, que absorve os
+        eventos por sala da mesma janela.
+
+        Com `calcular_figuras(view_name)`, as figuras de cada view afetada que tenha
+        clientes são calculadas uma única vez e enviadas à sala no evento "figuras",
+        antes do "atualizacao"; os clientes dessas views não precisam buscar os dados.
+        """
+        self.socketio = socketio
+        self.entregador = entregador
+        self.janela = Config.REALTIME_JANELA_COALESCENCIA if janela is None else janela
+        self.calcular_figuras = calcular_figuras
+        self._lock = threading.Lock()
+        self._pendentes = {}  # frozenset de salas (ou None = todos) -> [último payload, quantidade]
+        self._agendado = False
+
+    def receber(self, notificacao):
+        """Ouvinte do despachante de notificações: agenda o evento para as salas afetadas."""
+        NOTIFICACOES_RECEBIDAS.inc()
+        salas = salas_da_notificacao(notificacao)
+        chave = frozenset(salas) if salas is not None else None
+
+        with self._lock:
+            pendente = self._pendentes.setdefault(chave, [notificacao.payload, 0])
+            pendente[0] = notificacao.payload
+            pendente[1] += 1
+            if self._agendado:
+                return
+            self._agendado = True
+        self.socketio.start_background_task(self._descarregar)
+
+    def _descarregar(self):
+        self.socketio.sleep(self.janela)
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+            self._agendado = False
+
+        enviadas = {}  # view -> figuras enviadas nesta descarga (None se falhou)
+        if None in pendentes:
+            payload, quantidade = pendentes[None]
+            total = sum(quantidade for _, quantidade in pendentes.values())
+            views = self._enviar_figuras(self._views_com_clientes(), enviadas)
+            self.entregador.enviar("atualizacao", {"data": payload, "notificacoes": total, "figuras": views})
+            EVENTOS_EMITIDOS.labels("todos").inc()
+            return
+
+        for salas, (payload, quantidade) in pendentes.items():
+            views = self._enviar_figuras(self._views_com_clientes(salas), enviadas)
+            self.entregador.enviar(
+                "atualizacao",
+                {"data": payload, "notificacoes": quantidade, "figuras": views},
+                salas=sorted(salas),
+            )
+            EVENTOS_EMITIDOS.labels("sala").inc()
+
+    def _views_com_clientes(self, salas=None):
+        """
+        Views com clientes neste processo, entre as `salas` (todas, se None): só vale
+        calcular as figuras de quem vai recebê-las.
+        """
+        locais = self.entregador.salas_com_clientes()
+        if salas is not None:
+            locais = set(locais).intersection(salas)
+        return [sala for sala in locais if PADRAO_VIEW.fullmatch(sala)]
+
+    def _enviar_figuras(self, views, enviadas):
+        """
+        Calcula e emite o evento "figuras" para cada view, no máximo uma vez por descarga.
+        Retorna as views que receberam figuras; as demais recarregam pelos callbacks.
+        """
+        if self.calcular_figuras is None:
+            return []
+
+        com_figuras = []
+        for view_name in sorted(views):
+            if view_name not in enviadas:
+                inicio = time.perf_counter()
+                try:
+                    figuras = self.calcular_figuras(view_name)
+                except Exception as e:
+                    print(f"Erro ao calcular as figuras da view {view_name}: {e}")
+                    figuras = None
+                else:
+                    DURACAO_FIGURAS.observe(time.perf_counter() - inicio)
+                    self.entregador.enviar(
+                        "figuras",
+                        {"view_name": view_name, "figuras": figuras},
+                        salas=[view_name],
+                        chave=("figuras", view_name),
+                    )
+                enviadas[view_name] = figuras
+            if enviadas[view_name] is not None:
+                com_figuras.append(view_name)
+        return com_figuras
+
+
+def registrar_eventos(socketio, entregador):
+    """Registra os eventos do Socket.IO usados pelo dashboard."""
+
+    @socketio.on("connect")
+    def conectar(*_):
+        entregador.conectar(request.sid)
+
+    @socketio.on("disconnect")
+    def desconectar(*_):
+        entregador.desconectar(request.sid)
+
+    @socketio.on("inscrever")
+    def inscrever(dados):
+        """
+        Troca a sala do cliente pela da subfase (`view_name`) ou, sem ela, pela do lote
+        (`lote_id`) selecionado no dashboard. Com `confirmar`, o cliente confirma (ack)
+        cada entrega e passa a ter backpressure.
+        """
+        dados = dados if isinstance(dados, dict) else {}
+        view_name, lote_id = dados.get("view_name"), dados.get("lote_id")
+        if isinstance(view_name, str) and view_name in DataService.registro_views.views():
+            sala = view_name
+        elif isinstance(lote_id, int):
+            sala = sala_lote(lote_id)
+        else:
+            sala = None
+
+        entregador.inscrever(request.sid, sala, confirmar=dados.get("confirmar") is True)
+        return {"sala": sala}
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class LookupCache:
+    def __init__(self, nome, ttl=300.0):
+        """
+        Cache em memória para tabelas de dimensão pequenas (ex.: id → nome).
+
+        O valor é carregado na primeira leitura, recarregado quando passa de `ttl`
+        segundos e pode ser invalidado a qualquer momento (ex.: por um NOTIFY).
+        """
+        self.nome = nome
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._carga_lock = threading.Lock()
+        self._valor = None
+        self._carregado_em = 0.0
+        self._geracao = 0  # Incrementada a cada invalidação
+
+        self._hits = 0
+        self._misses = 0
+        self._cargas = 0
+        self._invalidacoes = 0
+
+    def _valido(self):
+        return self._valor is not None and time.monotonic() - self._carregado_em < self.ttl
+
+    def get(self, carregar):
+        """Retorna o valor em cache ou o recarrega chamando `carregar()`."""
+        with self._lock:
+            if self._valido():
+                self._hits += 1
+                return self._valor
+            self._misses += 1
+
+        # Apenas uma thread recarrega; as demais aguardam e reaproveitam o resultado
+        with self._carga_lock:
+            with self._lock:
+                if self._valido():
+                    return self._valor
+                geracao = self._geracao
+
+            valor = carregar()
+
+            with self._lock:
+                self._cargas += 1
+                # Uma invalidação durante a carga torna o valor lido potencialmente antigo
+                if geracao == self._geracao:
+                    self._valor = valor
+                    self._carregado_em = time.monotonic()
+            return valor
+
+    def invalidate(self):
+        """Descarta o valor atual; a próxima leitura consulta o banco novamente."""
+        with self._lock:
+            self._valor = None
+            self._geracao += 1
+            self._invalidacoes += 1
+
+    def stats(self):
+        """Retorna os contadores de uso do cache."""
+        with self._lock:
+            return {
+                "nome": self.nome,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "cargas": self._cargas,
+                "invalidacoes": self._invalidacoes,
+                "carregado": self._valido(),
+            }
+
+
+def estimar_tamanho(valor, amostra=20):
+    """
+    Estimativa barata do tamanho em memória de um resultado (lista de linhas),
+    extrapolando o tamanho médio das primeiras `amostra` linhas. Dicionários somam a
+    estimativa de cada valor (ex.: várias listas de linhas de uma mesma consulta).
+    """
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(estimar_tamanho(v, amostra) for v in valor.values())
+    if not isinstance(valor, list):
+        return sys.getsizeof(valor)
+    if not valor:
+        return sys.getsizeof(valor)
+
+    linhas = valor[:amostra]
+    total = 0
+    for linha in linhas:
+        total += sys.getsizeof(linha)
+        if isinstance(linha, dict):
+            total += sum(sys.getsizeof(v) for v in linha.values())
+    return sys.getsizeof(valor) + total * len(valor) // len(linhas)
+
+
+def assinar_json(valor):
+    """
+    Assinatura do conteúdo de um valor serializável em JSON. Ao contrário de `hash`,
+    é a mesma em todos os processos, então serve para ETags.
+    """
+    serializado = json.dumps(valor, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(serializado.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, nome, max_bytes, stale_while_revalidate=False, assinar=None, max_idade=None):
+        """
+        Cache LRU de resultados de consultas, limitado por memória e versionado.
+
+        Cada chave tem um contador de versão incrementado por `invalidate` (ex.: a cada
+        NOTIFY); uma entrada gravada com versão anterior é considerada desatualizada.
+        Com `stale_while_revalidate`, a entrada desatualizada continua sendo servida
+        enquanto uma thread em segundo plano busca a nova versão.
+
+        Os contadores de versão são deste processo. Com `assinar(valor)`, cada carga
+        guarda também uma assinatura do conteúdo, que identifica os dados da mesma
+        forma em todos os workers.
+
+        Com `max_idade` (s), uma entrada mais antiga que isso também é considerada
+        desatualizada: uma rede de segurança para alterações que não geraram NOTIFY.
+        """
+        self.nome = nome
+        self.max_bytes = max_bytes
+        self.stale_while_revalidate = stale_while_revalidate
+        self.assinar = assinar
+        self.max_idade = max_idade or None
+
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # chave -> (versão, valor, tamanho, assinatura, gravada_em)
+        self._versoes = {}
+        self._versao_global = 0
+        self._bytes = 0
+        self._carregando = {}  # chave -> threading.Event da carga em andamento
+
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._expiradas = 0
+        self._evictions = 0
+        self._erros = 0
+
+    def _versao(self, chave):
+        return (self._versao_global, self._versoes.get(chave, 0))
+
+    def _vigente(self, entrada, versao):
+        """Indica se a entrada tem a versão atual e não passou de `max_idade`. Requer o lock."""
+        if entrada is None or entrada[0] != versao:
+            return False
+        return self.max_idade is None or time.monotonic() - entrada[4] < self.max_idade
+
+    def versao(self, chave):
+        """Retorna a versão atual de uma chave."""
+        with self._lock:
+            return self._versao(chave)
+
+    def assinatura(self, chave):
+        """Assinatura do valor em cache da chave, ou None se ele está ausente ou desatualizado."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if self._vigente(entrada, self._versao(chave)):
+                return entrada[3]
+            return None
+
+    def get(self, chave, carregar):
+        """Retorna o valor da chave, chamando `carregar()` se estiver ausente ou desatualizado."""
+        return self.get_assinado(chave, carregar)[1]
+
+    def get_assinado(self, chave, carregar):
+        """
+        Como `get`, mas retorna (assinatura, valor), com a assinatura do valor entregue,
+        que pode ser anterior ao atual quando ele vier desatualizado (SWR). A assinatura
+        é None sem `assinar`.
+        """
+        while True:
+            with self._lock:
+                atual = self._versao(chave)
+                entrada = self._entradas.get(chave)
+                if self._vigente(entrada, atual):
+                    self._entradas.move_to_end(chave)
+                    self._hits += 1
+                    return entrada[3], entrada[1]
+                if entrada is not None and entrada[0] == atual:
+                    self._expiradas += 1
+
+                evento = self._carregando.get(chave)
+                if entrada is not None and self.stale_while_revalidate:
+                    self._entradas.move_to_end(chave)
+                    self._stale += 1
+                    if evento is None:
+                        evento = threading.Event()
+                        self._carregando[chave] = evento
+                        threading.Thread(
+                            target=self._recarregar_em_segundo_plano,
+                            args=(chave, carregar, atual, evento),
+                            daemon=True,
+                        ).start()
+                    return entrada[3], entrada[1]
+
+                if evento is None:
+                    self._misses += 1
+                    evento = threading.Event()
+                    self._carregando[chave] = evento
+                    break
+
+            # Outra thread já está carregando a mesma chave: aguardar e reaproveitar
+            evento.wait()
+
+        return self._recarregar(chave, carregar, atual, evento)
+
+    def _recarregar(self, chave, carregar, versao, evento):
+        """Carrega e grava o valor; retorna (assinatura, valor)."""
+        try:
+            valor = carregar()
+            assinatura = self.assinar(valor) if self.assinar is not None else None
+            with self._lock:
+                # Só grava se nada foi invalidado durante a carga
+                if versao == self._versao(chave):
+                    self._armazenar(chave, versao, valor, assinatura, time.monotonic())
+            return assinatura, valor
+        except Exception:
+            with self._lock:
+                self._erros += 1
+            raise
+        finally:
+            with self._lock:
+                self._carregando.pop(chave, None)
+            evento.set()
+
+    def _recarregar_em_segundo_plano(self, chave, carregar, versao, evento):
+        try:
+            self._recarregar(chave, carregar, versao, evento)
+        except Exception as e:
+            print(f"Erro ao revalidar '{chave}' no cache {self.nome}: {e}")
+
+    def _armazenar(self, chave, versao, valor, assinatura, gravada_em):
+        """Grava a entrada e remove as menos usadas até caber no limite. Requer o lock."""
+        anterior = self._entradas.pop(chave, None)
+        if anterior is not None:
+            self._bytes -= anterior[2]
+
+        tamanho = estimar_tamanho(valor)
+        if tamanho > self.max_bytes:
+            return
+
+        self._entradas[chave] = (versao, valor, tamanho, assinatura, gravada_em)
+        self._bytes += tamanho
+        while self._bytes > self.max_bytes:
+            _, (_, _, liberado, _, _) = self._entradas.popitem(last=False)
+            self._bytes -= liberado
+            self._evictions += 1
+
+    def invalidate(self, chave=None):
+        """Incrementa a versão de uma chave, ou de todas quando `chave` é None."""
+        with self._lock:
+            if chave is None:
+                self._versao_global += 1
+            else:
+                self._versoes[chave] = self._versoes.get(chave, 0) + 1
+
+    def stats(self):
+        """Retorna os contadores de uso do cache."""
+        with self._lock:
+            return {
+                "nome": self.nome,
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "stale_while_revalidate": self.stale_while_revalidate,
+                "max_idade": self.max_idade,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "expiradas": self._expiradas,
+                "evictions": self._evictions,
+                "erros": self._erros,
+            }
@@ -0,0 +1,136 @@
+import threading
+import uuid
+from collections import deque
+
+
+class ChangeFeed:
+    def __init__(self, max_versoes=50, max_linhas=5000):
+        """
+        Registro incremental de alterações das materialized views.
+
+        A cada nova leitura de uma view, as linhas são comparadas (por id) com o retrato
+        anterior; havendo diferença, a versão da view avança e as linhas inseridas,
+        atualizadas e removidas entram em um log limitado a `max_versoes` versões.
+        Alterações com mais de `max_linhas` linhas não são guardadas: quem estiver
+        antes delas precisa de uma ressincronização completa.
+
+        O log é deste processo: as versões são expostas como cursores "<época>.<versão>",
+        e um cursor emitido por outro worker ou antes de um reinício (outra época) sempre
+        exige ressincronização.
+        """
+        self.max_versoes = max_versoes
+        self.max_linhas = max_linhas
+        self.epoca = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._views = {}
+
+    @staticmethod
+    def _assinatura(linha):
+        return hash(tuple(linha.values()))
+
+    def cursor(self, versao):
+        """Cursor opaco entregue aos clientes para uma versão deste processo."""
+        return f"{self.epoca}.{versao}"
+
+    def ler_cursor(self, cursor):
+        """
+        Versão de um cursor, ou None se ele é de outra época. Levanta ValueError se o
+        cursor está malformado.
+        """
+        epoca, separador, versao = cursor.partition(".")
+        if not separador or not versao.isdigit():
+            raise ValueError("Cursor 'since' inválido.")
+        return int(versao) if epoca == self.epoca else None
+
+    def registrar(self, view_name, linhas):
+        """Compara a leitura atual da view com a anterior e registra a diferença."""
+        retrato = {linha["id"]: (self._assinatura(linha), linha) for linha in linhas}
+
+        with self._lock:
+            estado = self._views.get(view_name)
+            if estado is None:
+                versao = 1
+                self._views[view_name] = {
+                    "versao": versao,
+                    "base": versao,  # Menor versão a partir da qual o log consegue responder
+                    "retrato": {id_: assinatura for id_, (assinatura, _) in retrato.items()},
+                    "log": deque(maxlen=self.max_versoes),
+                }
+                return versao
+
+            anterior = estado["retrato"]
+            inseridas, atualizadas = [], []
+            for id_, (assinatura, linha) in retrato.items():
+                if id_ not in anterior:
+                    inseridas.append(linha)
+                elif anterior[id_] != assinatura:
+                    atualizadas.append(linha)
+            removidas = [id_ for id_ in anterior if id_ not in retrato]
+
+            total = len(inseridas) + len(atualizadas) + len(removidas)
+            if total == 0:
+                return estado["versao"]
+
+            estado["versao"] += 1
+            estado["retrato"] = {id_: assinatura for id_, (assinatura, _) in retrato.items()}
+            if total > self.max_linhas:
+                # Alteração grande demais para o log: versões anteriores exigem ressincronização
+                estado["log"].clear()
+                estado["base"] = estado["versao"]
+            else:
+                if len(estado["log"]) == estado["log"].maxlen:
+                    # A entrada mais antiga vai sair do log: a base avança junto
+                    estado["base"] = estado["log"][0]["versao"]
+                estado["log"].append({
+                    "versao": estado["versao"],
+                    "inseridas": inseridas,
+                    "atualizadas": atualizadas,
+                    "removidas": removidas,
+                })
+            return estado["versao"]
+
+    def versao(self, view_name):
+        """Cursor da versão atual da view, ou None se ela ainda não foi lida."""
+        with self._lock:
+            estado = self._views.get(view_name)
+            return self.cursor(estado["versao"]) if estado else None
+
+    def alteracoes_desde(self, view_name, cursor):
+        """
+        Retorna as alterações líquidas da view após o `cursor`, ou None quando ele não
+        pode ser atendido pelo log (outra época ou versão antiga demais: ressincronização).
+        """
+        desde = self.ler_cursor(cursor) if cursor is not None else None
+        with self._lock:
+            estado = self._views.get(view_name)
+            if estado is None or desde is None or not estado["base"] <= desde <= estado["versao"]:
+                return None
+
+            # Estado final de cada id alterado: ("inserida" | "atualizada", linha) ou ("removida", None)
+            finais = {}
+            for entrada in estado["log"]:
+                if entrada["versao"] <= desde:
+                    continue
+                for linha in entrada["inseridas"]:
+                    anterior = finais.get(linha["id"])
+                    # Removida e inserida de novo no intervalo equivale a uma atualização
+                    tipo = "atualizada" if anterior and anterior[0] == "removida" else "inserida"
+                    finais[linha["id"]] = (tipo, linha)
+                for linha in entrada["atualizadas"]:
+                    anterior = finais.get(linha["id"])
+                    tipo = "inserida" if anterior and anterior[0] == "inserida" else "atualizada"
+                    finais[linha["id"]] = (tipo, linha)
+                for id_ in entrada["removidas"]:
+                    anterior = finais.get(id_)
+                    if anterior and anterior[0] == "inserida":
+                        # Inserida e removida no intervalo: o cliente nunca a viu
+                        del finais[id_]
+                    else:
+                        finais[id_] = ("removida", None)
+
+            return {
+                "versao": self.cursor(estado["versao"]),
+                "inseridas": [linha for tipo, linha in finais.values() if tipo == "inserida"],
+                "atualizadas": [linha for tipo, linha in finais.values() if tipo == "atualizada"],
+                "removidas": [id_ for id_, (tipo, _) in finais.items() if tipo == "removida"],
+            }
@@ -1,27 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.config import Config
 from app.database import Database
+from app.metrics import medir_metodo
+from app.services.cache import LookupCache, ResultCache, assinar_json
+from app.services.change_feed import ChangeFeed
+from app.services.refresh_views import AgendadorRefresh
+from app.services.view_registry import COLUNAS, ViewRegistry
+from psycopg2 import sql
 from sqlalchemy import text
 
+# Colunas expostas pelas materialized views do schema acompanhamento
+COLUNAS_VIEW = ", ".join(COLUNAS)
+
+# Tabelas de dimensão lidas pelos caches de lotes e subfases
+TABELAS_DIMENSAO = ("lote", "subfase")
+
+# Filtros por lista de valores: chave do filtro -> coluna
+FILTROS_VALOR = (
+    ("situacao", "s_1_execucao_situacao"),
+    ("usuario", "s_1_execucao_usuario"),
+)
+
+# Filtros de intervalo de datas: chave do filtro -> (coluna, limite inferior?)
+FILTROS_DATA = (
+    ("inicio_de", "s_1_execucao_data_inicio", True),
+    ("inicio_ate", "s_1_execucao_data_inicio", False),
+    ("fim_de", "s_1_execucao_data_fim", True),
+    ("fim_ate", "s_1_execucao_data_fim", False),
+)
+
 
 class DataService:
+    # Caches das tabelas de dimensão, compartilhados por todas as instâncias
+    cache_lotes = LookupCache("lotes", ttl=Config.LOOKUP_CACHE_TTL)
+    cache_subfases = LookupCache("subfases", ttl=Config.LOOKUP_CACHE_TTL)
+
+    # Cache dos resultados das materialized views, versionado pelas notificações
+    cache_views = ResultCache(
+        "views",
+        max_bytes=Config.RESULT_CACHE_MAX_MB * 1024 * 1024,
+        stale_while_revalidate=Config.RESULT_CACHE_SWR,
+        assinar=assinar_json,  # Base das ETags, iguais em todos os workers
+        max_idade=Config.RESULT_CACHE_MAX_IDADE,
+    )
+
+    # Views válidas do schema acompanhamento e suas consultas preparadas
+    registro_views = ViewRegistry()
+
+    # Log de alterações por view, alimentado a cada nova leitura
+    feed_alteracoes = ChangeFeed(
+        max_versoes=Config.CHANGE_FEED_MAX_VERSOES,
+        max_linhas=Config.CHANGE_FEED_MAX_LINHAS,
+    )
+
+    # Refresh das views agendado a partir das notificações (ativado em run.py)
+    agendador_refresh = AgendadorRefresh(
+        registro_views,
+        debounce=Config.MATVIEW_REFRESH_DEBOUNCE,
+        max_espera=Config.MATVIEW_REFRESH_MAX_ESPERA,
+        workers=Config.MATVIEW_REFRESH_WORKERS,
+    )
+
     def __init__(self):
         self.db = Database()
 
     def obter_lotes(self):
         """
         Busca todos os dados da tabela macrocontrole.lote e retorna como um dicionário.
+        O resultado é servido do cache de dimensões enquanto estiver válido.
         """
-        query = "SELECT id, nome FROM macrocontrole.lote"
-        # Transformar em dicionário com o ID como chave
-        return {lote["id"]: lote["nome"] for lote in self.db.fetch_all(query)}
+        return self.cache_lotes.get(self._consultar_lotes)
 
     def obter_subfases(self):
         """
         Busca todos os dados da tabela macrocontrole.subfase e retorna como um dicionário.
+        O resultado é servido do cache de dimensões enquanto estiver válido.
         """
+        return self.cache_subfases.get(self._consultar_subfases)
+
+    @medir_metodo
+    def _consultar_lotes(self):
+        query = "SELECT id, nome FROM macrocontrole.lote"
+        # Transformar em dicionário com o ID como chave
+        return {lote["id"]: lote["nome"] for lote in self.db.fetch_all(query)}
+
+    @medir_metodo
+    def _consultar_subfases(self):
         query = "SELECT id, nome FROM macrocontrole.subfase"
         # Transformar em dicionário com o ID como chave
         return {subfase["id"]: subfase["nome"] for subfase in self.db.fetch_all(query)}
+
+    @classmethod
+    def invalidar_cache_dimensoes(cls, *_):
+        """
+        Invalida os caches de lotes e subfases. Usado como ouvinte do despachante de
+        notificações, assinado apenas para TABELAS_DIMENSAO.
+        """
+        cls.cache_lotes.invalidate()
+        cls.cache_subfases.invalidate()
+        cls.registro_views.invalidar()
+
+    @classmethod
+    def invalidar_cache_views(cls, notificacao):
+        """
+        Incrementa a versão das views afetadas pela notificação (todas, se ela for geral).
+        Usado como ouvinte do despachante de notificações.
+        """
+        if notificacao.geral:
+            cls.cache_views.invalidate()
+            return
+        for view_name in notificacao.views(cls.registro_views.views()):
+            cls.cache_views.invalidate(view_name)
+
+    @classmethod
+    def estatisticas_cache(cls):
+        """
+        Retorna os contadores de acerto/erro dos caches de dimensão e de views.
+        """
+        return [cls.cache_lotes.stats(), cls.cache_subfases.stats(), cls.cache_views.stats()]
     
+    @medir_metodo
     def listar_materialized_views(self):
         """
         Lista todas as materialized views disponíveis.
@@ -41,63 +141,303 @@ class DataService:
     def obter_dados_view_especifica(self, view_name):
         """
         Retorna os dados de uma materialized view específica, enriquecendo com os nomes do lote e subfase.
+        O resultado é servido do cache de views até a próxima notificação de atualização.
         """
-        # Obter nomes de lote e subfase como dicionários
-        lotes = self.obter_lotes()
-        subfases = self.obter_subfases()
+        return self.cache_views.get(view_name, lambda: self._consultar_dados_view(view_name))
 
-        query = f"""
-        SELECT 
-            id, lote_id, subfase_id, disponivel, restrito_pre, restrito_exec,
-            bloco, nome, dificuldade, tempo_estimado_minutos, dado_producao,
-            prioridade, s_1_execucao_usuario, s_1_execucao_data_inicio,
-            s_1_execucao_data_fim, s_1_execucao_situacao
-        FROM acompanhamento.{view_name};
+    def obter_dados_view_assinado(self, view_name):
+        """
+        Retorna (assinatura, dados) de uma view, com a assinatura do conteúdo entregue.
+        """
+        return self.cache_views.get_assinado(view_name, lambda: self._consultar_dados_view(view_name))
+
+    def assinatura_view(self, view_name):
+        """
+        Retorna a assinatura dos dados atuais de uma view no cache, sem consultar o banco,
+        ou None se a view não está em cache ou foi invalidada.
         """
-        dados_view = self.db.fetch_all(query)
+        return self.cache_views.assinatura(view_name)
+
+    @medir_metodo
+    def _consultar_dados_view(self, view_name, lotes=None, subfases=None):
+        # Obter nomes de lote e subfase como dicionários, se não foram fornecidos
+        lotes = lotes if lotes is not None else self.obter_lotes()
+        subfases = subfases if subfases is not None else self.obter_subfases()
+
+        dados_view = self.registro_views.fetch_all(view_name)
 
         # Enriquecer os dados com os nomes de lote e subfase
         for dado in dados_view:
             dado["lote_nome"] = lotes.get(dado["lote_id"], "Lote Desconhecido")
             dado["subfase_nome"] = subfases.get(dado["subfase_id"], "Subfase Desconhecida")
 
+        # Registrar a diferença em relação à leitura anterior no log de alterações
+        self.feed_alteracoes.registrar(view_name, dados_view)
         return dados_view
+
+    def obter_alteracoes_view(self, view_name, desde):
+        """
+        Retorna as linhas inseridas, atualizadas e removidas da view depois do cursor `desde`.
+        Se essa versão não estiver mais no log (ou for de outro processo), devolve a view
+        inteira com `ressincronizar` verdadeiro.
+        """
+        # Garante que a leitura mais recente já foi comparada com a anterior
+        self.obter_dados_view_especifica(view_name)
+
+        alteracoes = self.feed_alteracoes.alteracoes_desde(view_name, desde)
+        if alteracoes is not None:
+            return {"view_name": view_name, "ressincronizar": False, **alteracoes}
+
+        # A versão é lida antes dos dados: se eles forem mais novos, reaplicar alterações é inofensivo
+        versao = self.feed_alteracoes.versao(view_name)
+        return {
+            "view_name": view_name,
+            "ressincronizar": True,
+            "versao": versao,
+            "linhas": self.obter_dados_view_especifica(view_name),
+        }
+
+    @medir_metodo
+    def obter_pagina_view(self, view_name, limit, after_id=None):
+        """
+        Retorna uma página de uma materialized view com paginação por chave (id), feita no
+        próprio SQL, e o cursor da próxima página (None quando não há mais linhas).
+        """
+        # Uma linha a mais indica se existe próxima página
+        dados_view = self.registro_views.fetch_pagina(view_name, limit + 1, after_id)
+        proximo = dados_view[limit - 1]["id"] if len(dados_view) > limit else None
+        dados_view = dados_view[:limit]
+
+        lotes = self.obter_lotes()
+        subfases = self.obter_subfases()
+        for dado in dados_view:
+            dado["lote_nome"] = lotes.get(dado["lote_id"], "Lote Desconhecido")
+            dado["subfase_nome"] = subfases.get(dado["subfase_id"], "Subfase Desconhecida")
+
+        return dados_view, proximo
+
+    @medir_metodo
+    def obter_dados_view_filtrados(self, view_name, campos=None, filtros=None, limit=None, after_id=None):
+        """
+        Retorna apenas as colunas (`campos`) e linhas (`filtros`) pedidas de uma view, com
+        SELECT e WHERE parametrizados. Os filtros aceitos estão em FILTROS_VALOR (listas de
+        valores) e FILTROS_DATA (datas; limites "_ate" com data sem hora incluem o dia todo).
+        Com `limit`, pagina por id como `obter_pagina_view`. Retorna (dados, próximo cursor).
+        """
+        colunas = list(campos or COLUNAS)
+        invalidas = [coluna for coluna in colunas if coluna not in COLUNAS]
+        if invalidas:
+            raise ValueError(f"Campos inválidos: {', '.join(invalidas)}.")
+        if limit is not None and "id" not in colunas:
+            # O cursor da próxima página depende do id
+            colunas.insert(0, "id")
+
+        filtros = filtros or {}
+        condicoes = []
+        params = []
+        for chave, coluna in FILTROS_VALOR:
+            if filtros.get(chave):
+                condicoes.append(sql.SQL("{} = ANY(%s)").format(sql.Identifier(coluna)))
+                params.append(list(filtros[chave]))
+        for chave, coluna, inferior in FILTROS_DATA:
+            valor = filtros.get(chave)
+            if valor is None:
+                continue
+            if inferior:
+                operador = ">="
+            elif isinstance(valor, datetime):
+                operador = "<="
+            else:
+                operador, valor = "<", valor + timedelta(days=1)
+            condicoes.append(sql.SQL("{} " + operador + " %s").format(sql.Identifier(coluna)))
+            params.append(valor)
+        if after_id is not None:
+            condicoes.append(sql.SQL("id > %s"))
+            params.append(after_id)
+
+        query = self.registro_views.query(view_name, colunas)
+        if condicoes:
+            query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(condicoes)
+        if limit is not None:
+            # Uma linha a mais indica se existe próxima página
+            query += sql.SQL(" ORDER BY id LIMIT %s")
+            params.append(limit + 1)
+
+        dados_view = self.db.fetch_all(query, params)
+        proximo = None
+        if limit is not None:
+            proximo = dados_view[limit - 1]["id"] if len(dados_view) > limit else None
+            dados_view = dados_view[:limit]
+
+        # Enriquecer com os nomes apenas quando os ids foram pedidos
+        if "lote_id" in colunas:
+            lotes = self.obter_lotes()
+            for dado in dados_view:
+                dado["lote_nome"] = lotes.get(dado["lote_id"], "Lote Desconhecido")
+        if "subfase_id" in colunas:
+            subfases = self.obter_subfases()
+            for dado in dados_view:
+                dado["subfase_nome"] = subfases.get(dado["subfase_id"], "Subfase Desconhecida")
+
+        return dados_view, proximo
+
+    @medir_metodo
+    def iterar_dados_view_especifica(self, view_name, batch_size=None):
+        """
+        Versão em streaming de `obter_dados_view_especifica`: lê a view com um cursor
+        do lado do servidor e devolve as linhas enriquecidas uma a uma, sem
+        materializar a view inteira em memória.
+        """
+        query = self.registro_views.query(view_name)
+        lotes = self.obter_lotes()
+        subfases = self.obter_subfases()
+
+        for dado in self.db.iter_rows(query, batch_size=batch_size):
+            dado["lote_nome"] = lotes.get(dado["lote_id"], "Lote Desconhecido")
+            dado["subfase_nome"] = subfases.get(dado["subfase_id"], "Subfase Desconhecida")
+            yield dado
     
 
 
-    def obter_dados_todas_views(self):
+    def obter_dados_todas_views(self, paralelismo=None):
         """
         Consulta os dados de todas as materialized views disponíveis no schema.
+
+        As views são consultadas em paralelo por até `paralelismo` threads (limitado por
+        Config.DB_VIEWS_PARALELISMO e pelo tamanho do pool), preservando a ordem e o
+        erro individual de cada view.
+
+        Esta é a camada de consultas concorrentes do dashboard: as rotas do Flask são
+        síncronas, e um driver assíncrono (asyncpg) só deixaria a thread da requisição
+        bloqueada à espera do event loop. Nos workers eventlet/gevent da produção, o
+        psycogreen faz o psycopg2 ceder enquanto espera o banco.
+        """
+        # Obter a lista de materialized views do registro
+        views = sorted(self.registro_views.views())
+        return self._consultar_views(views, paralelismo)
+
+    def obter_dados_views(self, views, paralelismo=None):
         """
-        # Obter a lista de materialized views
-        views = self.listar_materialized_views()
-
-        dados_agrupados = []
-        for view in views:
-            view_name = view['materialized_view']
-            query = f"""
-            SELECT 
-                id, lote_id, subfase_id, disponivel, restrito_pre, restrito_exec,
-                bloco, nome, dificuldade, tempo_estimado_minutos, dado_producao,
-                prioridade, s_1_execucao_usuario, s_1_execucao_data_inicio,
-                s_1_execucao_data_fim, s_1_execucao_situacao
-            FROM acompanhamento.{view_name};
-            """
+        Consulta várias views de uma vez (ex.: todas as subfases de um lote), em paralelo.
+        Os nomes de lotes e subfases são resolvidos uma única vez para todas as views,
+        cada view passa pelo cache de resultados e os erros são reportados por view.
+        """
+        lotes = self.obter_lotes()
+        subfases = self.obter_subfases()
+
+        def consultar(view_name):
             try:
-                dados_view = self.db.fetch_all(query)
-                dados_agrupados.append({
-                    "view_name": view_name,
-                    "data": dados_view
-                })
+                dados_view = self.cache_views.get(
+                    view_name, lambda: self._consultar_dados_view(view_name, lotes, subfases)
+                )
+                return {"view_name": view_name, "data": dados_view}
             except Exception as e:
-                # Em caso de erro, adicionar um log indicando qual view falhou
-                dados_agrupados.append({
-                    "view_name": view_name,
-                    "error": str(e)
-                })
-        return dados_agrupados
+                return {"view_name": view_name, "error": str(e)}
+
+        return self._consultar_views(views, paralelismo, consultar)
+
+    def views_do_lote(self, lote_id):
+        """
+        Retorna as materialized views das subfases de um lote, ou None se o lote não tiver views.
+        """
+        for lote in self.obter_lotes_subfases():
+            if lote["lote_id"] == lote_id:
+                return [subfase["materialized_view"] for subfase in lote["subfases"]]
+        return None
+
+    def _consultar_views(self, views, paralelismo=None, consultar=None):
+        """Consulta uma lista de views com um pool de threads limitado."""
+        consultar = consultar or self._consultar_view
+        limite = min(paralelismo or Config.DB_VIEWS_PARALELISMO, Config.DB_VIEWS_PARALELISMO, Config.DB_POOL_MAX)
+        limite = max(1, min(limite, len(views)))
+
+        if limite == 1:
+            return [consultar(view_name) for view_name in views]
+
+        with ThreadPoolExecutor(max_workers=limite, thread_name_prefix="consulta_view") as executor:
+            return list(executor.map(consultar, views))
+
+    @medir_metodo
+    def _consultar_view(self, view_name):
+        """Consulta uma view, devolvendo o erro no próprio resultado em vez de propagá-lo."""
+        try:
+            dados_view = self.registro_views.fetch_all(view_name)
+            return {
+                "view_name": view_name,
+                "data": dados_view
+            }
+        except Exception as e:
+            # Em caso de erro, adicionar um log indicando qual view falhou
+            return {
+                "view_name": view_name,
+                "error": str(e)
+            }
     
     
+    @medir_metodo
+    def obter_resumo_view(self, view_name):
+        """
+        Retorna as agregações usadas pelos gráficos do dashboard, calculadas no Postgres:
+        contagem por situação, tarefas e tempo médio (em dias úteis) por usuário e
+        conclusões por dia. Evita transferir a view inteira para contar em Python.
+        """
+        tabela = self.registro_views.tabela(view_name)
+
+        query_total = sql.SQL("""
+        SELECT
+            COUNT(*) AS total,
+            to_char(MIN(s_1_execucao_data_inicio), 'YYYY-MM-DD"T"HH24:MI:SS') AS data_inicio
+        FROM {tabela};
+        """).format(tabela=tabela)
+        query_status = sql.SQL("""
+        SELECT s_1_execucao_situacao AS situacao, COUNT(*) AS total
+        FROM {tabela}
+        GROUP BY s_1_execucao_situacao
+        ORDER BY total DESC;
+        """).format(tabela=tabela)
+        # Dias úteis entre início e fim contados como no dashboard: cada dia do intervalo que cai de segunda a sexta
+        query_usuarios = sql.SQL("""
+        SELECT
+            COALESCE(v.s_1_execucao_usuario, 'Usuário Desconhecido') AS usuario,
+            COUNT(*) AS total,
+            AVG(du.dias)::float AS media_dias_uteis
+        FROM {tabela} v
+        LEFT JOIN LATERAL (
+            SELECT COUNT(*) AS dias
+            FROM generate_series(v.s_1_execucao_data_inicio, v.s_1_execucao_data_fim, interval '1 day') AS d
+            WHERE EXTRACT(ISODOW FROM d) < 6
+        ) du ON v.s_1_execucao_data_inicio IS NOT NULL AND v.s_1_execucao_data_fim IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1;
+        """).format(tabela=tabela)
+        query_diario = sql.SQL("""
+        SELECT
+            to_char(date_trunc('day', s_1_execucao_data_fim), 'YYYY-MM-DD') AS dia,
+            COUNT(*) AS total
+        FROM {tabela}
+        WHERE s_1_execucao_situacao = 'Finalizada' AND s_1_execucao_data_fim IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1;
+        """).format(tabela=tabela)
+
+        totais = self.db.fetch_all(query_total)[0]
+        usuarios = self.db.fetch_all(query_usuarios)
+        return {
+            "view_name": view_name,
+            "total": totais["total"],
+            "data_inicio": totais["data_inicio"],
+            "status": self.db.fetch_all(query_status),
+            "tarefas_por_usuario": [
+                {"usuario": u["usuario"], "total": u["total"]} for u in usuarios
+            ],
+            "tempo_medio_usuario": [
+                {"usuario": u["usuario"], "media_dias_uteis": u["media_dias_uteis"]}
+                for u in usuarios if u["media_dias_uteis"] is not None
+            ],
+            "conclusoes_diarias": self.db.fetch_all(query_diario),
+        }
+
+    @medir_metodo
     def obter_lotes_subfases(self):
         """
         Busca os lotes e as subfases associadas a cada lote.
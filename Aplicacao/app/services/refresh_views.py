@@ -0,0 +1,156 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from psycopg2 import errors, sql
+
+from app.database import Database
+from app.metrics import DURACAO_REFRESH
+
+# Canal do barramento em que o fim de cada refresh é anunciado, com o nome da view
+CANAL_REFRESH = "refresh_view"
+
+
+class AgendadorRefresh:
+    def __init__(self, registro_views, debounce=2.0, max_espera=30.0, workers=2):
+        """
+        Orquestra o REFRESH das materialized views a partir das notificações.
+
+        Cada notificação marca as views afetadas como pendentes; o refresh só começa
+        depois de `debounce` segundos sem novas notificações (ou `max_espera` segundos
+        após a primeira, para rajadas contínuas). As views pendentes são atualizadas com
+        REFRESH MATERIALIZED VIEW CONCURRENTLY por no máximo `workers` threads, e uma
+        view nunca é atualizada por duas threads ao mesmo tempo.
+        """
+        self.db = Database()
+        self.registro_views = registro_views
+        self.debounce = debounce
+        self.max_espera = max_espera
+        self.workers = workers
+        self.ouvintes = []
+
+        self._cond = threading.Condition()
+        self._pendentes = set()
+        self._primeira = 0.0  # Instante da notificação mais antiga ainda pendente
+        self._ultima = 0.0
+        self._em_andamento = set()
+        self._repetir = set()  # Views notificadas enquanto o próprio refresh rodava
+        self._executor = None
+        self._thread = None
+        self._estatisticas = {}
+
+    def assinar(self, ouvinte):
+        """Registra uma função chamada com o nome da view ao fim de cada refresh bem-sucedido."""
+        self.ouvintes.append(ouvinte)
+
+    def notificar(self, notificacao):
+        """
+        Ouvinte do despachante de notificações: agenda o refresh das views do lote/subfase
+        da notificação, ou de todas as views do dashboard se ela for geral.
+        """
+        self._marcar(notificacao.views(self.registro_views.views()))
+
+    def _marcar(self, views):
+        if not views:
+            return
+        with self._cond:
+            agora = time.monotonic()
+            if not self._pendentes:
+                self._primeira = agora
+            self._pendentes.update(views)
+            self._ultima = agora
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="refresh_view")
+                self._thread = threading.Thread(target=self._agendar, name="agendador_refresh", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _agendar(self):
+        """Espera a rajada de notificações acalmar e dispara os refreshes pendentes."""
+        while True:
+            with self._cond:
+                while not self._pendentes:
+                    self._cond.wait()
+                prazo = min(self._ultima + self.debounce, self._primeira + self.max_espera)
+                restante = prazo - time.monotonic()
+                if restante > 0:
+                    self._cond.wait(restante)
+                    continue
+
+                views, self._pendentes = self._pendentes, set()
+                for view in sorted(views):
+                    if view in self._em_andamento:
+                        # Dados mudaram durante o refresh em curso: atualizar de novo ao final
+                        self._repetir.add(view)
+                    else:
+                        self._em_andamento.add(view)
+                        self._executor.submit(self._atualizar, view)
+
+    def _refresh(self, view_name):
+        """Executa o REFRESH; retorna False quando foi preciso usar o modo não concorrente."""
+        tabela = self.registro_views.tabela(view_name)
+        try:
+            self.db.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(tabela))
+            return True
+        except errors.ObjectNotInPrerequisiteState:
+            # Sem índice único ou ainda não populada: o refresh comum bloqueia leituras enquanto roda
+            self.db.execute(sql.SQL("REFRESH MATERIALIZED VIEW {}").format(tabela))
+            return False
+
+    def _atualizar(self, view_name):
+        inicio = time.perf_counter()
+        concorrente, erro = None, None
+        try:
+            concorrente = self._refresh(view_name)
+        except Exception as e:
+            erro = str(e)
+            print(f"Erro ao atualizar a view {view_name}: {e}")
+        duracao = time.perf_counter() - inicio
+
+        with self._cond:
+            self._em_andamento.discard(view_name)
+            repetir = view_name in self._repetir
+            self._repetir.discard(view_name)
+
+            estat = self._estatisticas.setdefault(view_name, {
+                "execucoes": 0, "erros": 0, "total_ms": 0.0, "max_ms": 0.0,
+            })
+            if erro is None:
+                estat["execucoes"] += 1
+                estat["total_ms"] += duracao * 1000
+                estat["max_ms"] = max(estat["max_ms"], duracao * 1000)
+                estat["ultima_ms"] = duracao * 1000
+                estat["ultimo_refresh"] = datetime.now().isoformat(timespec="seconds")
+                estat["concorrente"] = concorrente
+            else:
+                estat["erros"] += 1
+                estat["ultimo_erro"] = erro
+
+        if erro is None:
+            DURACAO_REFRESH.labels(view_name).observe(duracao)
+            for ouvinte in self.ouvintes:
+                try:
+                    ouvinte(view_name)
+                except Exception as e:
+                    print(f"Erro ao processar refresh da view {view_name} em {ouvinte}: {e}")
+        if repetir:
+            self._marcar({view_name})
+
+    def stats(self):
+        """Retorna as views pendentes e em andamento e as durações de refresh por view."""
+        with self._cond:
+            views = {}
+            for view_name, estat in sorted(self._estatisticas.items()):
+                views[view_name] = {
+                    **estat,
+                    "media_ms": estat["total_ms"] / estat["execucoes"] if estat["execucoes"] else 0.0,
+                }
+            return {
+                "debounce": self.debounce,
+                "max_espera": self.max_espera,
+                "workers": self.workers,
+                "pendentes": sorted(self._pendentes),
+                "em_andamento": sorted(self._em_andamento),
+                "views": views,
+            }
@@ -0,0 +1,97 @@
+import re
+
+from psycopg2 import sql
+
+from app.config import Config
+from app.database import Database
+from app.services.cache import LookupCache
+
+# Colunas fixas lidas de cada materialized view do schema acompanhamento
+COLUNAS = (
+    "id", "lote_id", "subfase_id", "disponivel", "restrito_pre", "restrito_exec",
+    "bloco", "nome", "dificuldade", "tempo_estimado_minutos", "dado_producao",
+    "prioridade", "s_1_execucao_usuario", "s_1_execucao_data_inicio",
+    "s_1_execucao_data_fim", "s_1_execucao_situacao",
+)
+
+# Views das subfases: acompanhamento.lote_<lote_id>_subfase_<subfase_id>
+PADRAO_VIEW = re.compile(r"lote_(\d+)_subfase_(\d+)")
+
+# Menor valor de bigint: ponto de partida da primeira página
+ID_MINIMO = -(2 ** 63)
+
+
+class ViewDesconhecida(ValueError):
+    """O nome informado não corresponde a uma materialized view do schema acompanhamento."""
+
+
+class ViewRegistry:
+    def __init__(self):
+        """
+        Registro das materialized views do schema acompanhamento, lido de pg_matviews.
+
+        Somente nomes presentes no catálogo são aceitos, e a consulta de cada view é
+        montada com identificadores escapados e executada como prepared statement,
+        reaproveitando o plano em cada conexão do pool.
+        """
+        self.db = Database()
+        self.cache = LookupCache("catalogo_views", ttl=Config.VIEW_REGISTRY_TTL)
+
+    def _consultar_catalogo(self):
+        query = """
+        SELECT matviewname AS materialized_view
+        FROM pg_matviews
+        WHERE schemaname = 'acompanhamento';
+        """
+        return frozenset(view["materialized_view"] for view in self.db.fetch_all(query))
+
+    def views(self):
+        """Retorna o conjunto de views conhecidas."""
+        return self.cache.get(self._consultar_catalogo)
+
+    def validar(self, view_name):
+        """
+        Garante que `view_name` é uma view do catálogo, relendo-o uma vez caso a view
+        tenha sido criada depois da última carga.
+        """
+        if view_name in self.views():
+            return view_name
+        self.cache.invalidate()
+        if view_name in self.views():
+            return view_name
+        raise ViewDesconhecida(f"View '{view_name}' não encontrada no schema acompanhamento.")
+
+    def tabela(self, view_name):
+        """Identificador SQL escapado da view, após validação."""
+        return sql.Identifier("acompanhamento", self.validar(view_name))
+
+    def nome_qualificado(self, view_name):
+        """Nome da view como texto SQL já escapado, para drivers que não usam psycopg2.sql."""
+        nome = self.validar(view_name).replace('"', '""')
+        return f'acompanhamento."{nome}"'
+
+    def query(self, view_name, colunas=COLUNAS):
+        """Consulta SELECT das colunas fixas da view, após validação."""
+        return sql.SQL("SELECT {colunas} FROM {tabela}").format(
+            colunas=sql.SQL(", ").join(sql.Identifier(coluna) for coluna in colunas),
+            tabela=self.tabela(view_name),
+        )
+
+    def fetch_all(self, view_name):
+        """Lê todas as linhas da view usando o prepared statement da conexão."""
+        query = self.query(view_name)
+        return self.db.fetch_prepared(f"dash_{view_name}", query)
+
+    def fetch_pagina(self, view_name, limit, after_id=None):
+        """
+        Lê até `limit` linhas com id maior que `after_id`, em ordem de id (paginação por
+        chave), usando um prepared statement parametrizado.
+        """
+        # $1 explícito como bigint: inferido da coluna (integer), não aceitaria ID_MINIMO
+        query = sql.SQL("{select} WHERE id > $1::bigint ORDER BY id LIMIT $2").format(select=self.query(view_name))
+        inicio = after_id if after_id is not None else ID_MINIMO
+        return self.db.fetch_prepared(f"dash_{view_name}_pagina", query, (inicio, limit))
+
+    def invalidar(self, *_):
+        """Força a releitura do catálogo na próxima consulta."""
+        self.cache.invalidate()
@@ -11,6 +11,8 @@ def init_dash_app(server: Flask):
         __name__,
         server=server,
         url_base_pathname='/dashboard/',  # Base URL para o Dash
+        # Cliente Socket.IO usado por assets/realtime.js
+        external_scripts=["https://cdn.socket.io/4.7.5/socket.io.min.js"],
     )
     dash_app.title = "Dashboard de Atividades"
     
@@ -0,0 +1,66 @@
+// Atualizações em tempo real do dashboard: o navegador entra na sala do Socket.IO da
+// subfase selecionada. As figuras recalculadas pelo servidor chegam no evento "figuras"
+// e são aplicadas pelo botão oculto "sinal-figuras"; quando o evento "atualizacao" não
+// traz figuras para a subfase, o botão "sinal-atualizacao" faz os callbacks buscarem os dados.
+// A inscrição pede entregas confirmadas (ack): o servidor só envia o próximo evento
+// depois da confirmação do anterior.
+(function () {
+    if (typeof io === "undefined") {
+        return;
+    }
+
+    var socket = io({transports: ["websocket"]});
+    var inscricao = null;
+
+    function emitirInscricao() {
+        var dados = {confirmar: true};
+        for (var campo in inscricao) {
+            dados[campo] = inscricao[campo];
+        }
+        socket.emit("inscrever", dados);
+    }
+
+    function acionar(id) {
+        var botao = document.getElementById(id);
+        if (botao) {
+            botao.click();
+        }
+    }
+
+    window.dashRealtime = {
+        figuras: null,
+        inscrever: function (dados) {
+            inscricao = dados;
+            window.dashRealtime.figuras = null;
+            emitirInscricao();
+        }
+    };
+
+    // Após uma reconexão o servidor não lembra mais das salas do cliente
+    socket.on("connect", function () {
+        if (inscricao) {
+            emitirInscricao();
+        }
+    });
+
+    socket.on("figuras", function (dados, ack) {
+        if (ack) {
+            ack();
+        }
+        if (inscricao && dados.view_name === inscricao.view_name) {
+            window.dashRealtime.figuras = dados.figuras;
+            acionar("sinal-figuras");
+        }
+    });
+
+    socket.on("atualizacao", function (dados, ack) {
+        if (ack) {
+            ack();
+        }
+        var recebidas = (dados && dados.figuras) || [];
+        if (inscricao && recebidas.indexOf(inscricao.view_name) !== -1) {
+            return;  // Figuras já aplicadas pelo evento "figuras"
+        }
+        acionar("sinal-atualizacao");
+    });
+})();
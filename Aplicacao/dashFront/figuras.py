@@ -0,0 +1,340 @@
+import uuid
+from datetime import date, datetime, timedelta
+from collections import defaultdict
+
+from app.config import Config
+from app.services.cache import ResultCache
+from app.services.data_service import DataService
+
+# Colunas usadas pelo gráfico de previsão por usuário
+CAMPOS_PREVISAO_USUARIO = [
+    "s_1_execucao_usuario",
+    "s_1_execucao_data_inicio",
+    "s_1_execucao_data_fim",
+    "s_1_execucao_situacao",
+]
+
+# Gráficos do dashboard recalculados pelo servidor a cada alteração da subfase
+GRAFICOS = (
+    "activity-status-graph",
+    "progress-pie-chart",
+    "user-task-bar-chart",
+    "user-time-bar-chart",
+    "linha_objetivo_feito_e_esperado",
+    "linha_objetivo_feito_e_esperado_user",
+)
+
+
+# Dados das subfases selecionadas, por chave [view_name, id da leitura]; cada leitura é
+# compartilhada por todos os gráficos e descartada pelo LRU quando faltar memória
+cache_dados_subfase = ResultCache("dados_subfase", max_bytes=Config.DASH_DADOS_CACHE_MB * 1024 * 1024)
+
+
+def _para_datetime(valor):
+    """Aceita datas vindas do banco (datetime) ou de JSON (texto ISO 8601)."""
+    if isinstance(valor, datetime):
+        return valor.replace(tzinfo=None)
+    return datetime.fromisoformat(valor[:19])
+
+
+def figura_status(resumo):
+    status_counts = {item["situacao"]: item["total"] for item in resumo["status"]}
+
+    return {
+        "data": [
+            {
+                "x": list(status_counts.keys()),
+                "y": list(status_counts.values()),
+                "type": "bar",
+                "name": "Quantidade de Atividades",
+            }
+        ],
+        "layout": {
+            "title": "Quantidade de Atividades por Status",
+            "xaxis": {"title": "Status"},
+            "yaxis": {"title": "Quantidade"},
+        },
+    }
+
+
+def figura_progresso(resumo):
+    # Contagem por status já calculada no banco
+    status_counts = {item["situacao"]: item["total"] for item in resumo["status"]}
+
+    # Criar o gráfico de pizza
+    labels = list(status_counts.keys())
+    values = list(status_counts.values())
+
+    return {
+        "data": [
+            {
+                "values": values,
+                "labels": labels,
+                "type": "pie",
+                "hole": 0.4,
+            }
+        ],
+        "layout": {
+            "title": "% da Subfase Pronta",
+            "paper_bgcolor": "#1e1e1e",
+            "font": {"color": "white"},
+        },
+    }
+
+
+def figura_tarefas_usuario(resumo):
+    # Tarefas por usuário já contadas no banco
+    user_task_counts = {item["usuario"]: item["total"] for item in resumo["tarefas_por_usuario"]}
+
+    return {
+        "data": [
+            {
+                "x": list(user_task_counts.keys()),
+                "y": list(user_task_counts.values()),
+                "type": "bar",
+            }
+        ],
+        "layout": {
+            "title": "Tarefas Concluídas por Usuário",
+            "xaxis": {"title": "Usuários"},
+            "yaxis": {"title": "Quantidade de Tarefas"},
+            "paper_bgcolor": "#1e1e1e",
+            "font": {"color": "white"},
+        },
+    }
+
+
+def figura_tempo_usuario(resumo):
+    # Tempo médio por usuário (dias úteis) já calculado no banco
+    user_avg_times = {
+        item["usuario"]: item["media_dias_uteis"] for item in resumo["tempo_medio_usuario"]
+    }
+
+    return {
+        "data": [
+            {
+                "x": list(user_avg_times.keys()),
+                "y": list(user_avg_times.values()),
+                "type": "bar",
+            }
+        ],
+        "layout": {
+            "title": "Tempo Médio por Usuário (Dias Úteis)",
+            "xaxis": {"title": "Usuários"},
+            "yaxis": {"title": "Tempo Médio (dias)"},
+            "paper_bgcolor": "#1e1e1e",
+            "font": {"color": "white"},
+        },
+    }
+
+
+def figura_previsao(resumo):
+    # Obter a data mais antiga das atividades
+    data_inicio = datetime.fromisoformat(resumo["data_inicio"])
+
+    # Contar o número total de atividades
+    total_atividades = resumo["total"]
+
+    # Configuração do número de operadores ao longo do tempo
+    configuracao_operadores = [
+        (16, 2),  # Dias 1 a 5: 2 operadores
+    ]
+
+    # Progresso esperado
+    dias_uteis = []
+    progresso_esperado = []
+    atividades_concluidas = 0
+    dia_atual = data_inicio
+    total_dias = 0
+
+    for duracao, operadores in configuracao_operadores:
+        for _ in range(duracao):
+            if atividades_concluidas >= total_atividades:
+                break
+            dias_uteis.append(dia_atual)
+            produtividade_diaria = operadores  # Assume 1 atividade por operador/dia
+            atividades_concluidas += produtividade_diaria
+            progresso_esperado.append(min(atividades_concluidas, total_atividades))
+            dia_atual += timedelta(days=1)
+            while dia_atual.weekday() >= 5:  # Pular finais de semana
+                dia_atual += timedelta(days=1)
+            total_dias += 1
+
+    # Progresso real: conclusões por dia já agregadas no banco
+    progresso_real = defaultdict(int)
+    for item in resumo["conclusoes_diarias"]:
+        progresso_real[date.fromisoformat(item["dia"])] = item["total"]
+
+    # Verificar progresso real acumulado
+    progresso_real_acumulado = []
+    atividades_realizadas = 0
+    ultimo_dia_real = None
+
+    for dia in dias_uteis:
+        dia_date = dia.date()  # Garantir que o dia também é um objeto datetime.date
+        atividades_realizadas += progresso_real[dia_date]
+        progresso_real_acumulado.append(atividades_realizadas)
+        if progresso_real[dia_date] > 0:
+            ultimo_dia_real = dia
+
+    # Ajustar progresso real para mostrar apenas até o último dia com atividades concluídas
+    if ultimo_dia_real:
+        indice_ultimo_dia = dias_uteis.index(ultimo_dia_real)
+        progresso_real_acumulado = progresso_real_acumulado[:indice_ultimo_dia + 1]
+        dias_uteis_real = dias_uteis[:indice_ultimo_dia + 1]
+    else:
+        dias_uteis_real = []
+
+    # Construção do gráfico (datas em ISO 8601 para a figura poder ir por JSON)
+    return {
+        "data": [
+            {
+                "x": [dia.isoformat() for dia in dias_uteis],
+                "y": progresso_esperado,
+                "type": "line",
+                "name": "Progresso Esperado",
+            },
+            {
+                "x": [dia.isoformat() for dia in dias_uteis_real],
+                "y": progresso_real_acumulado,
+                "type": "line",
+                "name": "Progresso Real",
+            },
+        ],
+        "layout": {
+            "title": "Previsão vs Realidade de Conclusão de Atividades",
+            "xaxis": {"title": "Dias Úteis"},
+            "yaxis": {"title": "Número de Atividades Concluídas"},
+            "paper_bgcolor": "#1e1e1e",
+            "font": {"color": "white"},
+            "legend": {
+                "title": "Legenda",
+                "items": [
+                    {
+                        "name": f"Progresso Real (Última data: {ultimo_dia_real.strftime('%b %d') if ultimo_dia_real else 'N/A'}, Qtd de Atividades: {atividades_realizadas})"
+                    },
+                ]
+            },
+        },
+    }
+
+
+def figura_previsao_usuario(data):
+    # Organizar as atividades por usuário
+    atividades_por_usuario = defaultdict(list)
+    for item in data:
+        usuario = item.get("s_1_execucao_usuario", "Desconhecido")
+        atividades_por_usuario[usuario].append(item)
+
+    # Construir o gráfico por usuário
+    traces = []
+    for usuario, atividades in atividades_por_usuario.items():
+        # Obter a data mais antiga de início do usuário
+        datas_inicio = [
+            _para_datetime(item["s_1_execucao_data_inicio"])
+            for item in atividades
+            if item["s_1_execucao_data_inicio"] is not None
+        ]
+        if not datas_inicio:
+            continue
+
+        data_inicio = min(datas_inicio)
+        data_fim = datetime.now()
+
+        # Gerar lista de dias úteis entre a data de início e hoje
+        dias_uteis = []
+        dia_atual = data_inicio
+        while dia_atual.date() <= data_fim.date():
+            if dia_atual.weekday() < 5:  # Dias úteis apenas
+                dias_uteis.append(dia_atual)
+            dia_atual += timedelta(days=1)
+
+        # Progresso esperado (1 atividade por dia útil)
+        progresso_esperado = list(range(1, len(dias_uteis) + 1))
+
+        # Progresso real
+        progresso_real = defaultdict(int)
+        for item in atividades:
+            status = item["s_1_execucao_situacao"]
+            data_fim = item.get("s_1_execucao_data_fim")
+
+            if status == "Finalizada" and data_fim:
+                try:
+                    data_fim_date = _para_datetime(data_fim).date()
+                    progresso_real[data_fim_date] += 1
+                except Exception as e:
+                    print(f"Erro ao processar a data {data_fim}: {e}")
+
+        progresso_real_acumulado = []
+        atividades_realizadas = 0
+        for dia in dias_uteis:
+            dia_date = dia.date()
+            atividades_realizadas += progresso_real[dia_date]
+            progresso_real_acumulado.append(atividades_realizadas)
+
+        # Adicionar trace para o usuário
+        traces.append({
+            "x": [dia.strftime('%b %d, %Y') for dia in dias_uteis],
+            "y": progresso_esperado,
+            "type": "line",
+            "name": f"Progresso Esperado ({usuario})",
+        })
+        traces.append({
+            "x": [dia.strftime('%b %d, %Y') for dia in dias_uteis],
+            "y": progresso_real_acumulado,
+            "type": "line",
+            "name": f"Progresso Real ({usuario})",
+        })
+
+    # Construção do gráfico
+    return {
+        "data": traces,
+        "layout": {
+            "title": "Previsão vs Realidade de Conclusão de Atividades por Usuário",
+            "xaxis": {"title": "Dias Úteis"},
+            "yaxis": {"title": "Número de Atividades Concluídas"},
+            "paper_bgcolor": "#1e1e1e",
+            "font": {"color": "white"},
+        },
+    }
+
+
+def carregar_dados_subfase(view_name):
+    """
+    Lê, no próprio processo, tudo o que os gráficos de uma subfase usam: um resumo
+    agregado e as colunas do gráfico por usuário.
+    """
+    data_service = DataService()
+    resumo = data_service.obter_resumo_view(view_name)
+    linhas, _ = data_service.obter_dados_view_filtrados(view_name, campos=CAMPOS_PREVISAO_USUARIO)
+    return {"resumo": resumo, "linhas": linhas}
+
+
+def guardar_dados_subfase(view_name):
+    """Lê os dados da subfase e retorna a chave com que os gráficos os encontram."""
+    chave = [view_name, uuid.uuid4().hex]
+    dados_subfase(chave)
+    return chave
+
+
+def dados_subfase(chave):
+    """
+    Dados guardados por `guardar_dados_subfase`. Em outro worker, ou após sair do cache,
+    são lidos de novo uma única vez, mesmo com vários gráficos pedindo ao mesmo tempo.
+    """
+    view_name, _ = chave
+    return cache_dados_subfase.get(tuple(chave), lambda: carregar_dados_subfase(view_name))
+
+
+def calcular_figuras(view_name):
+    """Calcula todas as figuras do dashboard para uma subfase a partir de uma única leitura."""
+    dados = carregar_dados_subfase(view_name)
+    resumo = dados["resumo"]
+    return {
+        "activity-status-graph": figura_status(resumo),
+        "progress-pie-chart": figura_progresso(resumo),
+        "user-task-bar-chart": figura_tarefas_usuario(resumo),
+        "user-time-bar-chart": figura_tempo_usuario(resumo),
+        "linha_objetivo_feito_e_esperado": figura_previsao(resumo),
+        "linha_objetivo_feito_e_esperado_user": figura_previsao_usuario(dados["linhas"]),
+    }
@@ -88,9 +88,21 @@ def create_layout():
                 },
             ),
 
+            # Tempo real: sala do Socket.IO inscrita e sinal acionado a cada
+            # atualização da subfase selecionada (ver assets/realtime.js)
+            dcc.Store(id="inscricao-realtime"),
+            # Chave dos dados da subfase lidos uma vez e compartilhados pelos gráficos
+            dcc.Store(id="dados-subfase"),
+            html.Button(id="sinal-atualizacao", n_clicks=0, style={"display": "none"}),
+            html.Button(id="sinal-figuras", n_clicks=0, style={"display": "none"}),
+
             # Gráficos
             html.Div(
                 [
+                    html.Div(
+                        dcc.Graph(id="activity-status-graph"),  # Gráfico de Status das Atividades
+                        style={"padding": "10px", "flex": "1"},
+                    ),
                     html.Div(
                         dcc.Graph(id="progress-pie-chart"),  # Gráfico de Pizza
                         style={"padding": "10px", "flex": "1"},
@@ -0,0 +1,28 @@
+"""Configuração do gunicorn para o modo de produção (`python run.py --producao`)."""
+import os
+
+from app.config import Config, exigir_fila_distribuida
+
+# Workers assíncronos com suporte a WebSocket
+WORKER_CLASSES = {
+    "eventlet": "eventlet",
+    "gevent": "geventwebsocket.gunicorn.workers.GeventWebSocketWorker",
+}
+
+# Falha já no processo mestre, antes de subir workers que não receberiam as notificações
+exigir_fila_distribuida(Config.WEB_WORKERS)
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+worker_class = WORKER_CLASSES[Config.WEB_WORKER_CLASS]
+
+# O app é carregado em cada worker, depois do monkey patching do eventlet/gevent
+preload_app = False
+
+
+def child_exit(server, worker):
+    """Remove as métricas do worker encerrado quando o Prometheus roda em modo multiprocesso."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,15 +1,23 @@
 from app import create_app, socketio  # Importa o app Flask e SocketIO
 from app.api import api_bp  # Importa as rotas da API
+from app.barramento import criar_barramento
+from app.config import Config, exigir_fila_distribuida
+from app.notificacoes import Despachante
+from app.services.data_service import TABELAS_DIMENSAO, DataService
+from app.services.refresh_views import CANAL_REFRESH
 from app.notify import Notifier  # Importa o gerenciador de notificações
+from app.realtime import Difusor, Entregador, registrar_eventos
 from dashFront import init_dash_app  # Importa a função para inicializar o Dash
+from dashFront.figuras import calcular_figuras
+import os
+import sys
 import threading
 
-def start_notifier():
-    """Inicia o gerenciador de notificações do PostgreSQL."""
-    notifier = Notifier(socketio)
-    notifier.listen_notifications()
+# Filas de saída dos clientes do Socket.IO conectados a este processo
+entregador = Entregador(socketio)
 
-if __name__ == "__main__":
+def montar_app(producao=False):
+    """Cria o app Flask com as rotas da API, o Dash e o Socket.IO."""
     # Cria a aplicação Flask
     app = create_app()
 
@@ -19,9 +27,70 @@ if __name__ == "__main__":
     # Inicializa o Dash no app Flask
     init_dash_app(app)
 
-    # Inicia o Notifier em uma thread separada
-    threading.Thread(target=start_notifier, daemon=True).start()
+    if producao:
+        exigir_fila_distribuida(Config.WEB_WORKERS)
+
+    # O modo assíncrono acompanha o worker do gunicorn; fora dele não há monkey patching
+    # do eventlet/gevent, e o servidor de desenvolvimento usa threads
+    opcoes = {
+        "cors_allowed_origins": "*",
+        "async_mode": Config.WEB_WORKER_CLASS if producao else "threading",
+    }
+    if Config.SOCKETIO_MESSAGE_QUEUE:
+        # Eventos emitidos por qualquer worker chegam aos clientes conectados nos demais
+        opcoes["message_queue"] = Config.SOCKETIO_MESSAGE_QUEUE
+    if producao and Config.WEB_WORKERS > 1:
+        # Sem sessões fixas no balanceamento do gunicorn, o long-polling quebraria entre workers
+        opcoes["transports"] = ["websocket"]
+    socketio.init_app(app, **opcoes)
+
+    # Salas por lote/subfase para os eventos de atualização
+    registrar_eventos(socketio, entregador)
+    return app
+
+def start_notifier(eleicao=False):
+    """
+    Inicia o gerenciador de notificações do PostgreSQL em uma thread separada.
+
+    As notificações passam pelo barramento, que as entrega aos caches de cada processo;
+    com `eleicao`, só um dos processos mantém a conexão LISTEN. Em cada processo, o
+    despachante interpreta o payload, invalida só as views do lote/subfase afetados e
+    avisa os clientes do Socket.IO conectados ao processo.
+    """
+    # Com o refresh ativo, as views só mudam ao fim do REFRESH: caches e clientes esperam
+    # o aviso do agendador em vez de recarregar a view ainda antiga a cada notificação
+    canais_views = [CANAL_REFRESH] if Config.MATVIEW_REFRESH_ATIVO else None
+
+    despachante = Despachante()
+    despachante.assinar(
+        DataService.invalidar_cache_dimensoes, tabelas=TABELAS_DIMENSAO, canais=Config.NOTIFIER_CANAIS
+    )
+    despachante.assinar(DataService.invalidar_cache_views, canais=canais_views)
+    # Depois dos caches: as figuras enviadas às salas já são calculadas com os dados novos
+    difusor = Difusor(socketio, entregador, calcular_figuras=calcular_figuras)
+    despachante.assinar(difusor.receber, canais=canais_views)
+
+    barramento = criar_barramento()
+    barramento.assinar(despachante.despachar)
+    barramento.iniciar()
+
+    notifier = Notifier(ouvintes=[barramento.publicar], eleicao=eleicao)
+    if Config.MATVIEW_REFRESH_ATIVO:
+        # Só o Notifier eleito agenda refreshes; ao fim de cada um, todos os workers
+        # invalidam seus caches e avisam os clientes da view
+        agendador = DataService.agendador_refresh
+        agendador.assinar(lambda view_name: barramento.publicar(CANAL_REFRESH, view_name))
+        notifier.despachante.assinar(agendador.notificar)
+
+    threading.Thread(target=notifier.listen_notifications, daemon=True).start()
+
+if __name__ == "__main__":
+    if "--producao" in sys.argv:
+        # Vários workers eventlet/gevent servidos pelo gunicorn (ver gunicorn.conf.py e wsgi.py)
+        os.execvp("gunicorn", ["gunicorn", "--config", "gunicorn.conf.py", "wsgi:app"])
+
+    app = montar_app()
+    start_notifier()
 
     # Inicia o servidor Flask com suporte a WebSocket
-    socketio.init_app(app, cors_allowed_origins="*")
     socketio.run(app, debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,16 @@
+"""Ponto de entrada do modo de produção: `gunicorn --config gunicorn.conf.py wsgi:app`."""
+from app.config import Config
+
+# O psycopg2 precisa ceder ao hub do eventlet/gevent enquanto espera o banco
+if Config.WEB_WORKER_CLASS == "gevent":
+    from psycogreen.gevent import patch_psycopg
+else:
+    from psycogreen.eventlet import patch_psycopg
+patch_psycopg()
+
+from run import montar_app, start_notifier  # noqa: E402
+
+app = montar_app(producao=True)
+
+# Cada worker inicia o Notifier, mas só o eleito pelo advisory lock escuta o PostgreSQL
+start_notifier(eleicao=True)
@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template, jsonify, request
+from app.config import Config
 from app.services.data_service import DataService
 
 
@@ -31,6 +32,7 @@ def get_dados():
 def get_atividades():
     """
     Endpoint para buscar todas as atividades de um lote e subfase específicos.
+    Com `limit` e/ou `after_id`, retorna uma página ordenada por id e o `next_cursor`.
     """
     try:
         # Obter parâmetros da requisição
@@ -44,11 +46,27 @@ def get_atividades():
                 "error": "Parâmetros 'lote_id' e 'subfase_id' são obrigatórios"
             }), 400
 
-        # Chamar o método com os dois argumentos
-        atividades = data_service.obter_atividades(lote_id, subfase_id)
+        # Sem parâmetros de paginação, manter a resposta completa
+        if "limit" not in request.args and "after_id" not in request.args:
+            atividades = data_service.obter_atividades(lote_id, subfase_id)
+            return jsonify({"success": True, "data": atividades}), 200
+
+        limit = request.args.get("limit", Config.PAGINACAO_LIMITE_PADRAO, type=int)
+        after_id = request.args.get("after_id", type=int)
+        if limit is None or not 1 <= limit <= Config.PAGINACAO_LIMITE_MAX:
+            return jsonify({
+                "success": False,
+                "error": f"Parâmetro 'limit' deve estar entre 1 e {Config.PAGINACAO_LIMITE_MAX}"
+            }), 400
+        if "after_id" in request.args and after_id is None:
+            return jsonify({"success": False, "error": "Parâmetro 'after_id' deve ser um inteiro"}), 400
+
+        # Buscar uma linha a mais para saber se existe próxima página
+        atividades = data_service.obter_atividades(lote_id, subfase_id, limit=limit + 1, after_id=after_id)
+        proximo = atividades[limit - 1]["atividade_id"] if len(atividades) > limit else None
 
         # Retornar os dados como JSON
-        return jsonify({"success": True, "data": atividades}), 200
+        return jsonify({"success": True, "data": atividades[:limit], "next_cursor": proximo}), 200
 
     except Exception as e:
         # Retornar mensagem de erro em caso de exceção
@@ -68,4 +86,16 @@ def get_atividades_agrupadas():
 
     except Exception as e:
         # Retornar mensagem de erro em caso de exceção
-        return jsonify({"success": False, "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@api_bp.route("/api/admin/consultas_lentas", methods=["GET", "DELETE"])
+def get_consultas_lentas():
+    """
+    Endpoint administrativo com o log de consultas lentas e os planos EXPLAIN (ANALYZE, BUFFERS)
+    amostrados, do mais recente para o mais antigo. DELETE descarta os planos guardados.
+    """
+    registro = data_service.db.consultas_lentas
+    if request.method == "DELETE":
+        registro.limpar()
+    return jsonify({"success": True, "data": {**registro.stats(), "planos": registro.planos()}}), 200
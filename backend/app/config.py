@@ -16,3 +16,42 @@ class Config:
         "host": os.getenv("DB_HOST"),
         "port": os.getenv("DB_PORT", "5432"),
     }
+
+    # Paginação por chave (limit/after_id)
+    PAGINACAO_LIMITE_PADRAO = int(os.getenv("PAGINACAO_LIMITE_PADRAO", "1000"))
+    PAGINACAO_LIMITE_MAX = int(os.getenv("PAGINACAO_LIMITE_MAX", "10000"))
+
+    # Modo de produção (python run.py --producao): gunicorn com vários workers assíncronos
+    WEB_BIND = os.getenv("WEB_BIND", "0.0.0.0:5000")
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", "4"))
+    WEB_WORKER_CLASS = os.getenv("WEB_WORKER_CLASS", "eventlet")  # eventlet ou gevent
+
+    # Fila de mensagens compartilhada pelos workers (ex.: redis://localhost:6379/0)
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+
+    # Eleição do Notifier: só o processo que obtém o advisory lock escuta o PostgreSQL
+    NOTIFIER_LOCK_ID = int(os.getenv("NOTIFIER_LOCK_ID", "7310016"))
+    NOTIFIER_ELEICAO_INTERVALO = float(os.getenv("NOTIFIER_ELEICAO_INTERVALO", "10"))  # s
+
+    # Log de consultas lentas e captura amostrada de EXPLAIN (ANALYZE, BUFFERS)
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+    SLOW_QUERY_EXPLAIN_AMOSTRA = float(os.getenv("SLOW_QUERY_EXPLAIN_AMOSTRA", "0.1"))  # 0 a 1
+    SLOW_QUERY_MAX_PLANOS = int(os.getenv("SLOW_QUERY_MAX_PLANOS", "50"))
+
+    # Notifier: canais do LISTEN (separados por vírgula), heartbeat e backoff de reconexão (s)
+    NOTIFIER_CANAIS = [c.strip() for c in os.getenv("NOTIFIER_CANAIS", "atualizacao_tabela").split(",") if c.strip()]
+    NOTIFIER_HEARTBEAT = float(os.getenv("NOTIFIER_HEARTBEAT", "30"))
+    NOTIFIER_BACKOFF_MIN = float(os.getenv("NOTIFIER_BACKOFF_MIN", "1"))
+    NOTIFIER_BACKOFF_MAX = float(os.getenv("NOTIFIER_BACKOFF_MAX", "60"))
+
+
+def exigir_fila_distribuida(workers):
+    """
+    Impede o modo de produção com vários workers sem fila de mensagens: os eventos do
+    Notifier eleito não chegariam aos clientes conectados nos demais workers.
+    """
+    if workers > 1 and not Config.SOCKETIO_MESSAGE_QUEUE:
+        raise RuntimeError(
+            f"WEB_WORKERS={workers} exige SOCKETIO_MESSAGE_QUEUE (ex.: redis://localhost:6379/0) "
+            "para distribuir os eventos entre os workers; configure a fila ou use WEB_WORKERS=1."
+        )
@@ -0,0 +1,174 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from psycopg2 import sql
+
+# Tamanho máximo do texto da consulta guardado em cada registro
+MAX_TEXTO_CONSULTA = 4000
+
+# Nome do prepared statement recriado na conexão do EXPLAIN
+NOME_PREPARADA = "explain_consulta_lenta"
+
+
+class RegistroConsultasLentas:
+    def __init__(self, limite_ms=500.0, amostragem=0.1, max_planos=50, conectar=None, max_pendentes=10):
+        """
+        Log de consultas lentas do Database.
+
+        Consultas que levam `limite_ms` ou mais são impressas com parâmetros e número de
+        linhas. Uma fração `amostragem` delas é reexecutada com EXPLAIN (ANALYZE, BUFFERS)
+        por uma thread em segundo plano, em uma conexão própria aberta com `conectar()`:
+        a requisição não espera o EXPLAIN nem segura a conexão do pool. Até
+        `max_pendentes` consultas aguardam o EXPLAIN; as excedentes ficam sem plano.
+        Os planos ficam em um buffer circular com os últimos `max_planos` registros.
+        """
+        self.limite_ms = limite_ms
+        self.amostragem = amostragem
+        self.conectar = conectar
+        self._lock = threading.Lock()
+        self._planos = deque(maxlen=max_planos)
+        self._lentas = 0
+        self._descartadas = 0
+        self._fila = queue.Queue(maxsize=max_pendentes)
+        self._thread = None
+
+    @staticmethod
+    def formatar(cursor, consulta):
+        """Texto da consulta em uma linha, como aparece no log."""
+        if isinstance(consulta, sql.Composable):
+            consulta = consulta.as_string(cursor)
+        return " ".join(consulta.split())[:MAX_TEXTO_CONSULTA]
+
+    @staticmethod
+    def _renderizar(cursor, consulta, params):
+        """Comando com os parâmetros já interpolados, para ser reexecutado em outra conexão."""
+        with cursor.connection.cursor() as auxiliar:
+            return auxiliar.mogrify(consulta, params or None).decode()
+
+    @staticmethod
+    def _explicar(conn, comando, preparar=None):
+        """
+        Executa EXPLAIN (ANALYZE, BUFFERS) do comando e retorna o plano em texto. Com
+        `preparar`, o PREPARE é refeito antes, pois a conexão original não é a mesma.
+        """
+        with conn.cursor() as cursor:
+            try:
+                if preparar:
+                    cursor.execute(preparar)
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + comando)
+                return "\n".join(linha[0] for linha in cursor.fetchall())
+            finally:
+                if preparar:
+                    cursor.execute("DEALLOCATE ALL")
+
+    def registrar(self, cursor, consulta, params, duracao, linhas, texto=None, preparada=None):
+        """
+        Avalia uma consulta recém-executada em `cursor`. `consulta` é o comando executado
+        (usado no EXPLAIN) e `texto`, se informado, a consulta que aparece no log em seu lugar.
+        Para um EXECUTE, `preparada` é a consulta do prepared statement.
+        """
+        duracao_ms = duracao * 1000
+        if duracao_ms < self.limite_ms:
+            return
+
+        texto = self.formatar(cursor, texto if texto is not None else consulta)
+        print(
+            f"Consulta lenta ({duracao_ms:.0f} ms, {linhas} linhas): {texto} "
+            f"| parâmetros: {params!r}"
+        )
+        with self._lock:
+            self._lentas += 1
+
+        if self.conectar is None or random.random() >= self.amostragem:
+            return
+        if not texto.lstrip().upper().startswith(("SELECT", "WITH", "EXECUTE")):
+            # ANALYZE executa o comando: só consultas de leitura são explicadas
+            return
+
+        # Só a montagem do comando fica na requisição; o EXPLAIN roda em segundo plano
+        preparar = None
+        try:
+            if preparada is not None:
+                preparar = sql.SQL("PREPARE {} AS {}").format(
+                    sql.Identifier(NOME_PREPARADA), preparada
+                ).as_string(cursor)
+                consulta = sql.SQL("EXECUTE {}").format(sql.Identifier(NOME_PREPARADA)) + (
+                    sql.SQL(" ({})").format(sql.SQL(", ").join(sql.Placeholder() * len(params)))
+                    if params else sql.SQL("")
+                )
+            comando = self._renderizar(cursor, consulta, params)
+        except Exception as e:
+            print(f"Erro ao preparar o EXPLAIN da consulta lenta: {e}")
+            return
+
+        pedido = {
+            "registrado_em": datetime.now().isoformat(timespec="seconds"),
+            "duracao_ms": round(duracao_ms, 1),
+            "linhas": linhas,
+            "consulta": texto,
+            "parametros": repr(params) if params else None,
+            "comando": comando,
+            "preparar": preparar,
+        }
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._trabalhar, name="explain_consultas_lentas", daemon=True)
+                self._thread.start()
+        try:
+            self._fila.put_nowait(pedido)
+        except queue.Full:
+            with self._lock:
+                self._descartadas += 1
+
+    def _trabalhar(self):
+        """Executa os EXPLAIN pendentes, um por vez, em uma conexão própria (em autocommit)."""
+        conn = None
+        while True:
+            pedido = self._fila.get()
+            comando, preparar = pedido.pop("comando"), pedido.pop("preparar")
+            inicio = time.perf_counter()
+            try:
+                if conn is None or conn.closed:
+                    conn = self.conectar()
+                    conn.autocommit = True
+                plano, erro = self._explicar(conn, comando, preparar), None
+            except Exception as e:
+                plano, erro = None, str(e)
+                if conn is not None and not conn.closed:
+                    # Estado da conexão incerto após a falha: abrir outra no próximo pedido
+                    conn.close()
+                conn = None
+
+            with self._lock:
+                self._planos.append({
+                    **pedido,
+                    "plano": plano,
+                    "erro": erro,
+                    "explain_ms": round((time.perf_counter() - inicio) * 1000, 1),
+                })
+
+    def planos(self):
+        """Registros com plano guardados, do mais recente para o mais antigo."""
+        with self._lock:
+            return list(reversed(self._planos))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limite_ms": self.limite_ms,
+                "amostragem": self.amostragem,
+                "consultas_lentas": self._lentas,
+                "planos_guardados": len(self._planos),
+                "explain_pendentes": self._fila.qsize(),
+                "explain_descartados": self._descartadas,
+                "max_planos": self._planos.maxlen,
+            }
+
+    def limpar(self):
+        """Descarta os planos guardados."""
+        with self._lock:
+            self._planos.clear()
@@ -1,8 +1,19 @@
+import time
+
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from app.config import Config
+from app.consultas_lentas import RegistroConsultasLentas
 
 class Database:
+    # Log de consultas lentas com planos amostrados, compartilhado por todas as instâncias
+    consultas_lentas = RegistroConsultasLentas(
+        limite_ms=Config.SLOW_QUERY_MS,
+        amostragem=Config.SLOW_QUERY_EXPLAIN_AMOSTRA,
+        max_planos=Config.SLOW_QUERY_MAX_PLANOS,
+        conectar=lambda: psycopg2.connect(**Config.DB_CONFIG),
+    )
+
     def __init__(self):
         """Configuração centralizada do banco de dados."""
         self.config = Config.DB_CONFIG
@@ -15,5 +26,10 @@ class Database:
         """Executa uma query e retorna todos os resultados."""
         with self.connect() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                inicio = time.perf_counter()
                 cursor.execute(query, params or ())
-                return cursor.fetchall()
+                linhas = cursor.fetchall()
+                self.consultas_lentas.registrar(
+                    cursor, query, params, time.perf_counter() - inicio, len(linhas)
+                )
+                return linhas
@@ -9,11 +9,20 @@ class DataService:
         query = "SELECT * FROM macrocontrole.lote"
         return self.db.fetch_all(query)
     
-    def obter_atividades(self, lote_id, subfase_id):
+    def obter_atividades(self, lote_id, subfase_id, limit=None, after_id=None):
         """
         Busca todas as atividades de um lote e uma subfase específicos.
+
+        Com `limit`, retorna no máximo `limit` atividades com id maior que `after_id`
+        (paginação por chave, feita no SQL).
         """
-        query = """
+        paginacao = ""
+        params = [lote_id, subfase_id]
+        if after_id is not None:
+            paginacao += " AND a.id > %s"
+            params.append(after_id)
+
+        query = f"""
         SELECT 
             a.id AS atividade_id,
             ut.id AS unidade_trabalho_id,
@@ -28,11 +37,15 @@ class DataService:
         JOIN macrocontrole.unidade_trabalho ut ON ut.id = a.unidade_trabalho_id
         JOIN macrocontrole.subfase s ON s.id = ut.subfase_id
         JOIN dominio.tipo_situacao ts ON ts.code = a.tipo_situacao_id
-        WHERE ut.lote_id = %s AND ut.subfase_id = %s
-        ORDER BY a.id;
+        WHERE ut.lote_id = %s AND ut.subfase_id = %s{paginacao}
+        ORDER BY a.id
         """
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+
         # Executar a consulta com os parâmetros fornecidos
-        return self.db.fetch_all(query, (lote_id, subfase_id))
+        return self.db.fetch_all(query, tuple(params))
     
     def obter_atividades_agrupadas(self):
         """
@@ -0,0 +1,18 @@
+"""Configuração do gunicorn para o modo de produção (`python run.py --producao`)."""
+from app.config import Config, exigir_fila_distribuida
+
+# Workers assíncronos com suporte a WebSocket
+WORKER_CLASSES = {
+    "eventlet": "eventlet",
+    "gevent": "geventwebsocket.gunicorn.workers.GeventWebSocketWorker",
+}
+
+# Falha já no processo mestre, antes de subir workers que não receberiam os eventos
+exigir_fila_distribuida(Config.WEB_WORKERS)
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+worker_class = WORKER_CLASSES[Config.WEB_WORKER_CLASS]
+
+# O app é carregado em cada worker, depois do monkey patching do eventlet/gevent
+preload_app = False
@@ -1,23 +1,49 @@
 from app import create_app, socketio  # Importa o app Flask e SocketIO
 from app.api import api_bp  # Importa as rotas da API
+from app.config import Config, exigir_fila_distribuida
 from app.notify import Notifier  # Importa o gerenciador de notificações
+import os
+import sys
 import threading
 
-def start_notifier():
-    """Inicia o gerenciador de notificações do PostgreSQL."""
-    notifier = Notifier(socketio)
-    notifier.listen_notifications()
-
-if __name__ == "__main__":
+def montar_app(producao=False):
+    """Cria o app Flask com as rotas da API e o Socket.IO."""
     # Cria a aplicação Flask
     app = create_app()
 
     # Registra as rotas da API
     app.register_blueprint(api_bp)
 
-    # Inicia o Notifier em uma thread separada
-    threading.Thread(target=start_notifier, daemon=True).start()
+    if producao:
+        exigir_fila_distribuida(Config.WEB_WORKERS)
+
+    # O modo assíncrono acompanha o worker do gunicorn; fora dele não há monkey patching
+    # do eventlet/gevent, e o servidor de desenvolvimento usa threads
+    opcoes = {
+        "cors_allowed_origins": "*",
+        "async_mode": Config.WEB_WORKER_CLASS if producao else "threading",
+    }
+    if Config.SOCKETIO_MESSAGE_QUEUE:
+        # Eventos emitidos por qualquer worker chegam aos clientes conectados nos demais
+        opcoes["message_queue"] = Config.SOCKETIO_MESSAGE_QUEUE
+    if producao and Config.WEB_WORKERS > 1:
+        # Sem sessões fixas no balanceamento do gunicorn, o long-polling quebraria entre workers
+        opcoes["transports"] = ["websocket"]
+    socketio.init_app(app, **opcoes)
+    return app
+
+def start_notifier(eleicao=False):
+    """Inicia o gerenciador de notificações do PostgreSQL em uma thread separada."""
+    notifier = Notifier(socketio, eleicao=eleicao)
+    threading.Thread(target=notifier.listen_notifications, daemon=True).start()
+
+if __name__ == "__main__":
+    if "--producao" in sys.argv:
+        # Vários workers eventlet/gevent servidos pelo gunicorn (ver gunicorn.conf.py e wsgi.py)
+        os.execvp("gunicorn", ["gunicorn", "--config", "gunicorn.conf.py", "wsgi:app"])
+
+    app = montar_app()
+    start_notifier()
 
     # Inicia o servidor Flask com suporte a WebSocket
-    socketio.init_app(app, cors_allowed_origins="*")
     socketio.run(app, debug=True, host="0.0.0.0", port=5000)